@@ -0,0 +1,76 @@
+"""
+Semantic cache for call_llm answers.
+
+Answers are grouped by the field of the question being asked, and a new
+clarifying question reuses a stored answer when its embedding is close enough
+(cosine similarity) to one asked before for the same field. Entries expire
+after a TTL, each field keeps at most `max_per_field` entries (least recently
+used are dropped first). The cache lives as long as the process, which never
+reloads the document store, so the answers always match the loaded documents.
+"""
+import itertools
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+
+class SemanticAnswerCache:
+    def __init__(self, threshold=0.92, ttl=24 * 3600, max_per_field=256):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_per_field = max_per_field
+        self._fields = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0}
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, field, question_emb):
+        """
+        Returns the cached entry ({"question", "answer", "citations"}) of the
+        most similar question for this field, or None if none is close enough.
+        """
+        with self._lock:
+            entries = self._fields.get(field)
+            if not entries:
+                self.stats["misses"] += 1
+                return None
+
+            now = time.time()
+            expired = [key for key, entry in entries.items() if now - entry["created"] > self.ttl]
+            for key in expired:
+                del entries[key]
+            self.stats["expired"] += len(expired)
+            if not entries:
+                self.stats["misses"] += 1
+                return None
+
+            keys = list(entries)
+            similarities = np.stack([entries[key]["vector"] for key in keys]) @ self._unit(question_emb)
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.stats["misses"] += 1
+                return None
+
+            entries.move_to_end(keys[best])
+            self.stats["hits"] += 1
+            return entries[keys[best]]
+
+    def store(self, field, question_emb, question, answer, citations=None):
+        with self._lock:
+            entries = self._fields.setdefault(field, OrderedDict())
+            entries[next(self._ids)] = {
+                "vector": self._unit(question_emb),
+                "question": question,
+                "answer": answer,
+                "citations": citations or [],
+                "created": time.time(),
+            }
+            while len(entries) > self.max_per_field:
+                entries.popitem(last=False)
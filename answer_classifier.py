@@ -0,0 +1,91 @@
+"""
+Rule-based classification of answers before validate_with_llm.
+
+Obvious inputs are settled locally with the same VALID / QUESTION result the
+LLM would give, everything else returns None and goes to the LLM. The stats
+track how many inputs had to be escalated.
+"""
+import re
+import threading
+
+OPTIONS = re.compile(r'\(([^)]+)\)')
+ISO_DATE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+EMAIL = re.compile(r'^[\w.+-]+@[\w-]+(\.[\w-]+)+$')
+NUMBER = re.compile(r'^\+?[\d\s().-]+$')
+INTERROGATIVE = re.compile(
+    r"^(what|what's|whats|why|how|when|where|which|who|whom|whose|"
+    r"can|could|do|does|did|is|are|am|was|were|should|would|will|may|must|shall|"
+    r"isn't|aren't|don't|doesn't|explain|tell me)\b",
+    re.IGNORECASE,
+)
+# Last word of the fields that hold numbers, e.g. passport_number, fax_country_code
+NUMERIC_FIELD_SUFFIXES = ("number", "code", "extension", "year", "count")
+
+
+def parse_options(question_text):
+    """'Are you married? (Yes/No)' -> ['Yes', 'No']"""
+    match = OPTIONS.search(question_text)
+    if not match:
+        return []
+    options = [opt.strip() for opt in re.split(r'[,/]', match.group(1))]
+    return [opt for opt in options if opt and opt.lower() != 'e.g.']
+
+
+def is_numeric_field(field):
+    """passport_number and uci_number_2 hold numbers, residence_country and has_fax_number don't."""
+    words = re.sub(r"_\d+$", "", field).split("_")
+    # has_* fields are Yes/No questions about the thing named after them
+    return words[-1] in NUMERIC_FIELD_SUFFIXES and words[0] != "has"
+
+
+def classify_answer(question_text, field, user_input, options=None):
+    """
+    Returns {"status": ..., "value": ...} like validate_with_llm, or None if
+    the input is ambiguous and should be escalated to the LLM.
+    `options` are the question's answer options if already parsed.
+    """
+    text = user_input.strip()
+    answer = text.rstrip('?').strip()
+    if not answer:
+        return None
+
+    for option in parse_options(question_text) if options is None else options:
+        if answer.lower() == option.lower():
+            return {"status": "VALID", "value": option}
+
+    if "date" in field and ISO_DATE.match(answer):
+        return {"status": "VALID", "value": answer}
+    if "email" in field and EMAIL.match(answer):
+        return {"status": "VALID", "value": answer}
+    if is_numeric_field(field) and NUMBER.match(answer) and any(c.isdigit() for c in answer):
+        return {"status": "VALID", "value": answer}
+
+    if text.endswith('?') and INTERROGATIVE.match(text):
+        return {"status": "QUESTION", "value": text}
+
+    return None
+
+
+class ClassifierStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"VALID": 0, "QUESTION": 0, "escalated": 0}
+
+    def record(self, result):
+        with self._lock:
+            self.counts[result["status"] if result else "escalated"] += 1
+
+    def escalation_rate(self):
+        with self._lock:
+            total = sum(self.counts.values())
+            return self.counts["escalated"] / total if total else 0.0
+
+    def summary(self):
+        with self._lock:
+            counts = dict(self.counts)
+        return {
+            "counts": counts,
+            # Every input settled locally is a validate_with_llm call saved
+            "llm_calls_saved": counts["VALID"] + counts["QUESTION"],
+            "escalation_rate": self.escalation_rate(),
+        }
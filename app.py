@@ -1,16 +1,29 @@
 from flask import Flask, request, jsonify
 import uuid
 import os
-import json
-from chatbot_copy import chat_step, load_state, save_state
+from chatbot_copy import chat_step, edit_answer, state_codec, classifier_stats, rerank_stats
+from state_store import get_state_store, VersionConflict
+from session_cache import SessionCache, SESSION_CACHE_SIZE, FLUSH_INTERVAL
 
 app = Flask(__name__)
 
-STATE_DIR = "conversations"
-os.makedirs(STATE_DIR, exist_ok=True)
-
-def get_state_file(conversation_id: str):
-    return os.path.join(STATE_DIR, f"{conversation_id}.json")
+# SQLite by default, STATE_BACKEND=json keeps the conversations/<id>.json files
+SESSION_FSYNC = os.environ.get("SESSION_FSYNC", "flush")
+# SQLite rows use the compact state encoding, STATE_ENCODING=json writes them as JSON
+STATE_ENCODING = os.environ.get("STATE_ENCODING", "binary")
+store = get_state_store(durable=SESSION_FSYNC != "off", codec=state_codec if STATE_ENCODING == "binary" else None)
+# Hot conversations are served from memory and written behind, SESSION_CACHE_SIZE=0 disables it
+session_cache_size = int(os.environ.get("SESSION_CACHE_SIZE", SESSION_CACHE_SIZE))
+if session_cache_size > 0:
+    store = SessionCache(
+        store,
+        max_entries=session_cache_size,
+        flush_interval=float(os.environ.get("SESSION_FLUSH_INTERVAL", FLUSH_INTERVAL)),
+        fsync=SESSION_FSYNC,
+    )
+
+def conflict_response(conversation_id: str):
+    return jsonify({"error": f"Conversation {conversation_id} was updated by another request, please retry"}), 409
 
 @app.route("/initialize", methods=["POST"])
 def initialize():
@@ -19,7 +32,7 @@ def initialize():
     state = {"answers": {}, "messages": [], "question_index": 0, "skip": 0, "attempt_counter": {}}
 
     # Save initial state
-    save_state(state, get_state_file(conversation_id))
+    store.create(conversation_id, state)
 
     # First question comes from chat_step with empty input
     result = chat_step(state, "")
@@ -40,28 +53,54 @@ def chat_step_endpoint():
     if not conversation_id:
         return jsonify({"error": "conversation_id required"}), 400
 
-    state_file = get_state_file(conversation_id)
-    if os.path.exists(state_file):
-        state = load_state(state_file)
-    else:
+    loaded = store.load(conversation_id)
+    if loaded is None:
         return jsonify({"error": "Conversation not found"}), 404
+    state, version = loaded
 
     result = chat_step(state, user_input)
 
-    # Persist new state
-    save_state(result["state"], state_file)
+    # Persist new state, unless another request saved this conversation meanwhile
+    try:
+        store.save(conversation_id, result["state"], expected_version=version)
+    except VersionConflict:
+        return conflict_response(conversation_id)
+
+    return jsonify(result)
+
+@app.route("/edit-answer", methods=["POST"])
+def edit_answer_endpoint():
+    """Change an earlier answer and continue from the first question it affects"""
+    data = request.json
+    conversation_id = data.get("conversation_id")
+    field = data.get("field")
+    value = data.get("value")
+
+    if not conversation_id or not field or value is None:
+        return jsonify({"error": "conversation_id, field and value required"}), 400
+
+    loaded = store.load(conversation_id)
+    if loaded is None:
+        return jsonify({"error": "Conversation not found"}), 404
+    state, version = loaded
+
+    result = edit_answer(state, field, value, data.get("position"))
+    try:
+        store.save(conversation_id, result["state"], expected_version=version)
+    except VersionConflict:
+        return conflict_response(conversation_id)
 
     return jsonify(result)
 
 @app.route("/load-conversation/<conversation_id>", methods=["GET"])
 def load_conversation(conversation_id):
     """Resume an existing conversation"""
-    state_file = get_state_file(conversation_id)
-    if not os.path.exists(state_file):
+    loaded = store.load(conversation_id)
+    if loaded is None:
         return jsonify({"error": "Conversation not found"}), 404
 
-    state = load_state(state_file)
-    return jsonify({"conversation_id": conversation_id, "state": state})
+    state, version = loaded
+    return jsonify({"conversation_id": conversation_id, "state": state, "version": version})
 
 @app.route("/save-conversation/<conversation_id>", methods=["POST"])
 def save_conversation(conversation_id):
@@ -71,18 +110,37 @@ def save_conversation(conversation_id):
     if not state:
         return jsonify({"error": "State required"}), 400
 
-    save_state(state, get_state_file(conversation_id))
-    return jsonify({"message": "Conversation saved"})
+    # Clients that send the version they loaded get the same conflict check as /chat-step
+    try:
+        version = store.save(conversation_id, state, expected_version=data.get("version"))
+    except VersionConflict:
+        return conflict_response(conversation_id)
+    return jsonify({"message": "Conversation saved", "version": version})
 
 @app.route("/delete-conversation/<conversation_id>", methods=["DELETE"])
 def delete_conversation(conversation_id):
-    """Delete a conversation and its state file"""
-    state_file = get_state_file(conversation_id)
-    if os.path.exists(state_file):
-        os.remove(state_file)
+    """Delete a conversation and its saved state"""
+    if store.delete(conversation_id):
         return jsonify({"message": "Conversation deleted"})
     return jsonify({"error": "Conversation not found"}), 404
 
+@app.route("/session-cache-stats", methods=["GET"])
+def session_cache_stats():
+    """Hit ratio, flush lag and size of the session cache"""
+    if not isinstance(store, SessionCache):
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **store.summary()})
+
+@app.route("/classifier-stats", methods=["GET"])
+def classifier_stats_endpoint():
+    """Answers settled locally and the share escalated to the LLM"""
+    return jsonify(classifier_stats.summary())
+
+@app.route("/rerank-stats", methods=["GET"])
+def rerank_stats_endpoint():
+    """How often the remote rerank was bypassed and the latency it saved"""
+    return jsonify(rerank_stats.summary())
+
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,185 @@
+"""
+Local lexical (BM25) index over the crawled documents.
+
+Dense retrieval needs a remote embed call and is weak on exact terms such as
+form numbers ("IMM 5645") or acronyms ("CAQ"). This index runs locally, so it
+can be fused with the dense scores or used on its own when the embed API is
+slow or down.
+
+Postings are kept in compressed-sparse-row arrays (one slice of document ids
+and term frequencies per term) and saved as a single .npz. Documents added
+after the build go into a small in-memory delta that is searched alongside
+the main postings and merged into them by compact().
+"""
+import json
+import os
+import re
+from collections import Counter
+import numpy as np
+
+from retrieval_index import top_k
+
+BM25_PATH = "others/bm25_index.npz"
+
+TOKEN = re.compile(r"[a-z0-9]+")
+# "IMM 5645", "imm-5645" and "IMM5645" all index as "imm5645" as well
+FORM_NUMBER = re.compile(r"\b(imm|cit|irm)[\s\-]?(\d{4})\b")
+
+
+def tokenize(text):
+    text = text.lower()
+    tokens = TOKEN.findall(text)
+    tokens.extend(prefix + number for prefix, number in FORM_NUMBER.findall(text))
+    return tokens
+
+
+def document_text(doc):
+    return f"{doc.get('title') or ''} {doc.get('data') or ''}"
+
+
+class BM25Index:
+    def __init__(self, vocab, term_offsets, postings_docs, postings_tfs, doc_lengths, k1=1.5, b=0.75):
+        self.vocab = vocab
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        # Documents added since the last compact(): term -> [(doc id, tf), ...]
+        self._delta = {}
+        self._delta_lengths = []
+
+    @classmethod
+    def build(cls, texts, **params):
+        index = cls({}, np.zeros(1, dtype=np.int64), np.empty(0, dtype=np.int32),
+                    np.empty(0, dtype=np.uint16), np.empty(0, dtype=np.int32), **params)
+        index.add_documents(texts)
+        index.compact()
+        return index
+
+    def __len__(self):
+        return len(self.doc_lengths) + len(self._delta_lengths)
+
+    def add_documents(self, texts):
+        """
+        Indexes new documents. Their ids continue after the existing ones, so
+        they must be appended to the document store in the same order.
+        """
+        for text in texts:
+            doc_id = len(self)
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                self._delta.setdefault(term, []).append((doc_id, tf))
+            self._delta_lengths.append(sum(counts.values()))
+
+    def compact(self):
+        """Merges the added documents into the main postings."""
+        if not self._delta_lengths:
+            return
+        terms = sorted(set(self.vocab) | set(self._delta))
+        offsets, docs, tfs = [0], [], []
+        for term in terms:
+            term_docs, term_tfs = self._postings(term)
+            docs.append(term_docs.astype(np.int32))
+            tfs.append(np.minimum(term_tfs, np.iinfo(np.uint16).max).astype(np.uint16))
+            offsets.append(offsets[-1] + len(term_docs))
+
+        self.vocab = {term: t for t, term in enumerate(terms)}
+        self.term_offsets = np.array(offsets, dtype=np.int64)
+        self.postings_docs = np.concatenate(docs) if docs else np.empty(0, dtype=np.int32)
+        self.postings_tfs = np.concatenate(tfs) if tfs else np.empty(0, dtype=np.uint16)
+        self.doc_lengths = np.concatenate([self.doc_lengths, np.array(self._delta_lengths, dtype=np.int32)])
+        self._delta = {}
+        self._delta_lengths = []
+
+    def _postings(self, term):
+        """All (doc ids, tfs) for a term, main postings first."""
+        docs, tfs = [], []
+        t = self.vocab.get(term)
+        if t is not None:
+            start, end = self.term_offsets[t], self.term_offsets[t + 1]
+            docs.append(self.postings_docs[start:end])
+            tfs.append(self.postings_tfs[start:end])
+        if term in self._delta:
+            delta = np.array(self._delta[term], dtype=np.int64)
+            docs.append(delta[:, 0])
+            tfs.append(delta[:, 1])
+        if not docs:
+            return None, None
+        return np.concatenate(docs), np.concatenate(tfs).astype(np.float32)
+
+    def scores(self, query):
+        """BM25 score of every document for the query."""
+        n_docs = len(self)
+        lengths = np.concatenate([self.doc_lengths, np.array(self._delta_lengths, dtype=np.int32)]).astype(np.float32)
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if not n_docs:
+            return scores
+        avgdl = lengths.mean() or 1.0
+        for term in set(tokenize(query)):
+            docs, tfs = self._postings(term)
+            if docs is None:
+                continue
+            idf = np.log((n_docs - len(docs) + 0.5) / (len(docs) + 0.5) + 1.0)
+            norm = self.k1 * (1 - self.b + self.b * lengths[docs] / avgdl)
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        return scores
+
+    def search(self, queries, k):
+        """
+        Args:
+            queries: list of query strings
+            k: number of documents to return per query
+
+        Returns:
+            ids, scores: one list per query, best match first. Documents that
+            share no term with the query are left out.
+        """
+        ids, scores = [], []
+        for query in queries:
+            row = self.scores(query)
+            best = top_k(row, k)
+            best = best[row[best] > 0]
+            ids.append(best)
+            scores.append(row[best])
+        return ids, scores
+
+    def save(self, path=BM25_PATH):
+        self.compact()
+        terms = sorted(self.vocab, key=self.vocab.get)
+        np.savez_compressed(
+            path,
+            terms=np.frombuffer(json.dumps(terms).encode("utf-8"), dtype=np.uint8),
+            term_offsets=self.term_offsets,
+            postings_docs=self.postings_docs,
+            postings_tfs=self.postings_tfs,
+            doc_lengths=self.doc_lengths,
+            params=np.array([self.k1, self.b]),
+        )
+
+    @classmethod
+    def load(cls, path=BM25_PATH):
+        saved = np.load(path)
+        terms = json.loads(saved["terms"].tobytes().decode("utf-8"))
+        k1, b = saved["params"]
+        return cls(
+            {term: t for t, term in enumerate(terms)},
+            saved["term_offsets"],
+            saved["postings_docs"],
+            saved["postings_tfs"],
+            saved["doc_lengths"],
+            k1=float(k1),
+            b=float(b),
+        )
+
+
+def load_bm25_index(n_docs, path=BM25_PATH):
+    """Returns the saved index, or None if it is missing or built for other documents."""
+    if not os.path.exists(path):
+        return None
+    index = BM25Index.load(path)
+    if len(index) != n_docs:
+        print(f"⚠️ {path} was built for {len(index)} documents, found {n_docs}. Rebuild it.")
+        return None
+    return index
@@ -1,40 +1,70 @@
-import cohere
 import json
 import re
 import numpy as np
-import aiofiles
 import json
 import subprocess
-import pandas as pd
 import os
 import json
 import traceback
 import logging
+import time
 
 # from cohere.core.api_error import ApiError  # confirm the correct path
 from cohere import UnprocessableEntityError
 
-from input_validation import is_valid_date, is_valid_location, get_normalized_address, validate_full_phone_number, \
+from cohere_client import get_client
+from input_validation import is_valid_date, get_normalized_address, validate_full_phone_number, \
     suggest_typo_correction
-from question_relationship import skipped_questions
+from question_relationship import load_skip_rules
+from retrieval_index import load_index, reciprocal_rank_fusion
+from bm25_index import load_bm25_index
+from question_table import load_question_table
+from message_history import compact_history
+from answer_classifier import classify_answer, ClassifierStats
+from reranking import is_decisive, local_rerank, RerankStats, RERANK_TIMEOUT
+from doc_store import DocStore, StoreError
+from embedding_cache import EmbeddingCache
+from answer_cache import SemanticAnswerCache
+from clarifications import load_clarifications, default_query, is_generic_question
+from query_planner import plan_queries, CONFIDENCE_THRESHOLD as PLANNER_CONFIDENCE
+from dli_lookup import DLIIndex, NO_MATCH, is_dli_number
+from state_codec import StateCodec
 
 # Specify the path to your JSON file
 file_path_questions = 'trainning/questions_file_updated.json'
 output_path = 'trainning/immigration_data_reduced.json'
 
-# Open and load the JSON data
-with open(file_path_questions, 'r', encoding='utf-8') as file:
-    questions = json.load(file)
+# Compiled once, chat_step only indexes into it
+questions = load_question_table(file_path_questions)
+# Validated against the questions, chat_step looks up the jump target per answer
+skip_rules = load_skip_rules(questions)
 
-co = cohere.ClientV2(
+co = get_client(
     "geVCM43IEeDluUKP5YHEZnD8UxTd4DBH0t5gWUsp"
 )
 
-# Load the embeddings
-doc_emb = np.load("others/doc_embeddings.npy")
-
-with open(output_path, 'r', encoding='utf-8') as f:
-    data = json.load(f)
+# Load the embeddings and documents. The document store is memory-mapped and
+# shared between workers, the legacy files are loaded fully into memory.
+try:
+    doc_store = DocStore.open()
+    doc_emb = doc_store.embeddings
+    data = doc_store.documents
+except StoreError as e:
+    print(f"⚠️ {e} Loading {output_path} into memory instead.")
+    doc_store = None
+    doc_emb = np.load("others/doc_embeddings.npy").astype(np.float32)
+    with open(output_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+doc_index = load_index(doc_emb)
+bm25_index = load_bm25_index(len(data))
+rerank_stats = RerankStats()
+classifier_stats = ClassifierStats()
+query_embedding_cache = EmbeddingCache()
+answer_cache = SemanticAnswerCache()
+default_clarifications = load_clarifications(doc_store.version if doc_store else None)
+# School sheet indexed by (school, city), reloaded when the sheet changes
+dli_index = DLIIndex()
 
 system_message = """
 You are a form validation assistant. Please follow these strict rules:
@@ -54,6 +84,9 @@ Examples:
 Respond ONLY with one of: VALID: <answer>, INVALID: <reason>, or QUESTION: <question>.
 """
 
+# Saved states refer to the prompt and the question texts instead of copying them
+state_codec = StateCodec([system_message] + [q.text for q in questions], [q.field for q in questions])
+
 
 # Updated Version
 def validate_with_llm(chat_history):
@@ -92,9 +125,87 @@ def validate_with_llm(chat_history):
         return {"status": "INVALID", "value": "LLM failed to process input. Please try again."}
 
 
-def call_llm(messages, last_question):
+def validate_answer(q, user_input, messages):
+    """Settles obvious answers locally and only asks validate_with_llm about the rest."""
+    result = classify_answer(q.text, q.field, user_input, q.options)
+    classifier_stats.record(result)
+    if result is None:
+        result = validate_with_llm(messages)
+    return result
+
+
+def precomputed_clarification(field, question_text, user_question):
+    """The precomputed explanation of the question if the user asks a vague follow-up about it, else None."""
+    entry = default_clarifications.get(field)
+    # Entries built for an older wording of the question are not served
+    if entry and entry["question"] == question_text and is_generic_question(user_question):
+        return entry["answer"]
+    return None
+
+
+def answer_question(q, messages):
+    """Answers the user's question about q, the last message."""
+    user_question = messages[-1]['content']
+    # "What does this mean?" has no immigration keywords but is about the form question
+    clarification = precomputed_clarification(q.field, q.text, user_question)
+    if clarification:
+        return clarification
+    if is_immigration_question(user_question):
+        return call_llm(messages, messages[-2]['content'], q.field)
+    general_context = [
+        {"role": "system", "content": f"The user was asked: {q.text}"},
+        {"role": "user", "content": user_question}
+    ]
+    return general_llm(general_context)
+
+
+def call_llm(messages, last_question, field=None):
     # print(messages)
     # print(last_question)
+    user_question = messages[-1]['content']
+
+    # Vague follow-ups get the precomputed explanation of the question
+    clarification = precomputed_clarification(field, last_question, user_question)
+    if clarification:
+        return clarification
+
+    # Serve a stored answer if a similar question was asked for this field
+    question_emb = None
+    if field:
+        try:
+            question_emb = query_embedding_cache.embed(co, [user_question], model="embed-v4.0", input_type="search_query")[0]
+            cached = answer_cache.lookup(field, question_emb)
+        except Exception as e:
+            # Answer without the cache, retrieval falls back to lexical search
+            logging.warning(f"Answer cache skipped: {e}")
+            question_emb, cached = None, None
+        if cached:
+            return cached["answer"]
+
+    # Build the search queries locally when the question is specific enough,
+    # otherwise let the LLM write them
+    search_queries, confidence = plan_queries(user_question, last_question, field or "")
+    planned_locally = confidence >= PLANNER_CONFIDENCE
+    if not planned_locally:
+        search_queries = generate_search_queries(messages)
+
+    # Nothing specific to search for: explain the question, precomputed offline
+    if len(search_queries) == 0:
+        precomputed = default_clarifications.get(field)
+        if precomputed and precomputed["question"] == last_question:
+            return precomputed["answer"]
+        search_queries.append(default_query(last_question))
+
+    # Keyword queries retrieve well but the answer should address the question itself
+    result = answer_from_documents(search_queries, user_question if planned_locally else None)
+
+    if question_emb is not None:
+        answer_cache.store(field, question_emb, user_question, result["answer"], result["citations"])
+    return result["answer"]
+
+
+def generate_search_queries(messages):
+    """Asks the LLM for search queries, returns an empty list if it wants none."""
     search_queries = []
     query_gen_tool = [
         {
@@ -130,39 +241,69 @@ def call_llm(messages, last_question):
         for tc in res.message.tool_calls:
             queries = json.loads(tc.function.arguments)["queries"]
             search_queries.extend(queries)
+    return search_queries
 
-    if len(search_queries) == 0:
-        query = "Explain this question in further detail to the user: " + last_question
-        search_queries.append(query)
-
-    query_emb = co.embed(
-        model="embed-v4.0",
-        input_type="search_query",
-        texts=search_queries,
-        embedding_types=["float"],
-    ).embeddings.float
-
-    # doc_emb = np.array(doc_emb)
-    # Compute dot product similarity and display results
+
+def answer_from_documents(search_queries, question=None):
+    """
+    Retrieves, reranks and answers with the documents found for the queries.
+    Reranking and the answer use `question`, or the first query if not given.
+
+    Returns:
+        dict with the "answer" text, its "citations" and the indexes of the
+        "documents" it was given.
+    """
+    question = question or search_queries[0]
+
+    # Top-n documents for every query, dense and lexical rankings merged
+    # with reciprocal rank fusion
     n = 5
-    scores = np.dot(query_emb, np.transpose(doc_emb))[0]
-    max_idx = np.argsort(-scores)[:n]
+    rankings = []
+    query_emb = None
+    try:
+        # Repeated queries are answered from the cache without an embed call
+        query_emb = query_embedding_cache.embed(co, search_queries, model="embed-v4.0", input_type="search_query")
+        rankings.extend(doc_index.search(query_emb, n)[0])
+    except Exception as e:
+        if bm25_index is None:
+            raise
+        logging.warning(f"Embed failed, using lexical retrieval only: {e}")
+    if bm25_index is not None:
+        rankings.extend(bm25_index.search(search_queries, n)[0])
+    max_idx = reciprocal_rank_fusion(rankings)[:n]
 
     retrieved_documents = [data[item] for item in max_idx]
 
-    # Rerank the documents
-    results = co.rerank(
-        model="rerank-v3.5",
-        query=search_queries[0],
-        documents=[doc["data"] for doc in retrieved_documents],
-        top_n=2,
-    )
-
-    reranked_documents = [
-        retrieved_documents[result.index] for result in results.results
-    ]
+    # Rerank the documents, unless the dense scores already settle it
+    top_n = 2
+    start = time.perf_counter()
+    dense_scores = None
+    if query_emb is not None:
+        dense_scores = np.dot(doc_emb[max_idx], np.transpose(query_emb)).max(axis=1)
 
-    messages = [{"role": "user", "content": search_queries[0]}]
+    if dense_scores is not None and is_decisive(dense_scores, top_n):
+        rerank_path = "margin"
+        order = [int(i) for i in np.argsort(-dense_scores)[:top_n]]
+    else:
+        try:
+            results = co.rerank(
+                model="rerank-v3.5",
+                query=question,
+                documents=[doc["data"] for doc in retrieved_documents],
+                top_n=top_n,
+                deadline=RERANK_TIMEOUT,
+            )
+            rerank_path = "remote"
+            order = [result.index for result in results.results]
+        except Exception as e:
+            logging.warning(f"Rerank failed, reranking locally: {e}")
+            rerank_path = "local"
+            order = local_rerank(question, [doc["data"] for doc in retrieved_documents], top_n)
+    rerank_stats.record(rerank_path, time.perf_counter() - start)
+
+    reranked_documents = [retrieved_documents[i] for i in order]
+
+    messages = [{"role": "user", "content": question}]
 
     # Generate the response
     response = co.chat(
@@ -171,22 +312,73 @@ def call_llm(messages, last_question):
         documents=reranked_documents,
     )
 
-    # Display the response
-    result = response.message.content[0].text
-    return result
+    return {
+        "answer": response.message.content[0].text,
+        "citations": [citation.dict() for citation in response.message.citations or []],
+        "documents": [int(max_idx[i]) for i in order],
+    }
 
 
 def find_dli(school_name, city_name):
-    df = pd.read_excel("trainning/School Information.xlsx")
-    result = df[
-        (df['School'].str.strip().str.lower() == school_name.strip().lower()) &
-        (df['City'].str.strip().str.lower() == city_name.strip().lower())
-        ]
-
-    if not result.empty:
-        return result['DLI #'].unique().tolist()
+    """
+    Returns:
+        dli: DLI numbers of the school, NO_MATCH if there is none, None if
+            close matches need confirming
+        candidates: the close matches to confirm
+    """
+    result, candidates = dli_index.best_match(school_name, city_name)
+
+    if result:
+        return result, []
+    elif candidates:
+        return None, candidates
+    else:
+        return NO_MATCH, []
+
+
+def _dli_candidates_reply(candidates):
+    lines = ["I couldn't find an exact match for your school. Is it one of these?"]
+    for i, c in enumerate(candidates, 1):
+        lines.append(f"{i}. {c['school'].title()} ({c['city'].title()}): {', '.join(c['dli'])}")
+    lines.append("Reply with its number, type your DLI number, or 0 if it isn't listed.")
+    return "\n".join(lines)
+
+
+def _dli_step(state, user_input, answers, messages, question_index, attempt_counter):
+    """
+    Fills in the school's DLI number. A confident match is recorded right
+    away, otherwise the closest schools are listed and the user's pick (or
+    a DLI number typed in) is recorded on the next turn.
+    """
+    candidates = state.get("dli_candidates")
+    choice = user_input.strip()
+    if is_dli_number(choice):
+        dli = [choice.upper()]
+    elif candidates:
+        if not (choice.isdigit() and int(choice) <= len(candidates)):
+            dli = None
+        else:
+            dli = candidates[int(choice) - 1]["dli"] if int(choice) else NO_MATCH
     else:
-        return "No match found."
+        school, city = answers.get('school_name', ''), answers.get('school_city', '')
+        dli, candidates = find_dli(school, city)
+
+    if dli is None:
+        return {
+            "reply": _dli_candidates_reply(candidates),
+            "state": {
+                **state,
+                "answers": answers,
+                "messages": messages,
+                "question_index": question_index,
+                "skip": 0,
+                "attempt_counter": attempt_counter,
+                "dli_candidates": candidates,
+            },
+            "done": False
+        }
+    answers['school_dli#'] = dli
+    return _next_step_response(answers, messages, question_index + 1, 0, attempt_counter)
 
 def fill_pdf(answers):
     form_data = list(answers.values())
@@ -237,10 +429,9 @@ def chat_step(state: dict, user_input: str) -> dict:
         if not messages:
             messages.append({"role": "system", "content": system_message})
 
-        # Handle skipping logic
-        while skip > 0:
-            question_index += 1
-            skip -= 1
+        # States saved before skip rules resolved to absolute targets may still carry a relative skip
+        question_index += skip
+        skip = 0
 
         if question_index >= len(questions):
             return {
@@ -256,7 +447,7 @@ def chat_step(state: dict, user_input: str) -> dict:
             }
         
         q = questions[question_index]
-        field = q['field']
+        field = q.field
         attempt_counter[field] = attempt_counter.get(field, 0) + 1
 
         # Prompt OVERRIDE after 3 failed attempts
@@ -271,13 +462,8 @@ def chat_step(state: dict, user_input: str) -> dict:
                 "done": False
             }
 
-        # Special: DLI lookup
-        if field == 'school_dli#':
-            answers[field] = find_dli(answers.get('school_name', ''), answers.get('school_city', ''))
-            return _next_step_response(answers, messages, question_index + 1, 0, attempt_counter)
-
         # Special: Citizenship rule
-        if field == 'travel_start_date' and 'chin' in answers.get('citizenship', '').lower():
+        if _ends_form_early(q, answers):
             return _next_step_response(answers, messages, len(questions), 0, attempt_counter)
 
         # OVERRIDE path
@@ -297,9 +483,13 @@ def chat_step(state: dict, user_input: str) -> dict:
 
         # If coming from override input
         if state.get("override_mode"):
-            answers[field] = user_input
+            answers[field] = [user_input.strip()] if field == 'school_dli#' else user_input
             return _next_step_response(answers, messages, question_index + 1, 0, attempt_counter)
 
+        # Special: DLI lookup
+        if field == 'school_dli#':
+            return _dli_step(state, user_input, answers, messages, question_index, attempt_counter)
+
             # Handle location/date/phone question detection
         
         # Handle location/date/phone question detection
@@ -308,43 +498,35 @@ def chat_step(state: dict, user_input: str) -> dict:
             return {"reply": None, "state": state, "done": False}
     
         # Answer with options validation
-        option_match = re.search(r'\(([^)]+)\)', q['text'], flags=re.IGNORECASE)
-        if option_match and not user_input.endswith('?') and "date" not in q['field'].lower():
-            raw_options = [opt.strip() for opt in re.split(r'[,/]', option_match.group(1))]
-            raw_options = [opt for opt in raw_options if opt.lower() != 'e.g.']
-            allowed_options_lower = [opt.lower() for opt in raw_options]
-            if user_input.lower() not in allowed_options_lower:
+        if q.options and not user_input.endswith('?'):
+            if user_input.lower() not in q.options_lower:
                 return {
-                    "reply": f"❌ Please enter one of the valid options: {' or '.join(raw_options)} \
+                    "reply": f"❌ Please enter one of the valid options: {' or '.join(q.options)} \
                         ❓ Or ask a follow-up question for clarification. Make sure to end your question with a question mark (?)",
                     "state": state,
                     "done": False
                 }
 
         # Date field special validation
-        if "date" in q['field']:
-            no_future_allowed = q['field'] in ['date_of_birth', 'date of birth', 'passport_issue_date']
-            no_past_allowed = 'expiry' in q['field'].lower()
-            is_valid, result = is_valid_date(user_input, no_future_allowed=no_future_allowed, no_past_allowed=no_past_allowed)
+        if q.kind == "date":
+            is_valid, result = is_valid_date(user_input, no_future_allowed=q.no_future_allowed, no_past_allowed=q.no_past_allowed)
             if not is_valid:
                 return {"reply": f"❌ {result}", "state": state, "done": False}
             else:
                 user_input = result.strftime('%Y-%m-%d')
 
         # Address normalization
-        address_suffixes = ["_address", "_city", "_country", "_postal_code"]
-        if any(q['field'].endswith(suffix) for suffix in address_suffixes):
-            normalized_input = get_normalized_address(user_input, q['field'])
+        if q.kind == "address":
+            normalized_input = get_normalized_address(user_input, q.field)
             if not normalized_input:
                 return {"reply": "❌ Couldn't validate the address. Try again.", "state": state, "done": False}
             else:
                 user_input = normalized_input
 
         # Phone validation
-        phone_fields = ['_phone_country_code', '_phone_number', '_phone_extension', '_full_phone_number']
-        if any(q['field'].endswith(suffix) for suffix in phone_fields):
-            answers[q['field']] = user_input
-            is_valid_phone, full_phone, fields_to_clear = validate_full_phone_number(answers, q['field'])
+        if q.kind == "phone":
+            answers[q.field] = user_input
+            is_valid_phone, full_phone, fields_to_clear = validate_full_phone_number(answers, q.field)
             if not is_valid_phone:
                 print("❌ The phone number is invalid. Please re-enter the phone information.")
                 for field in fields_to_clear:
@@ -356,16 +538,16 @@ def chat_step(state: dict, user_input: str) -> dict:
                 }
 
         if user_input.endswith('?'):
-            messages.append({"role": "system", "content": q['text']})
+            messages.append({"role": "system", "content": q.text})
             messages.append({"role": "user", "content": user_input})
+            messages[:] = compact_history(messages, q.text)
 
-            result = validate_with_llm(messages)
+            result = validate_answer(q, user_input, messages)
 
             if result['status'] == "VALID":
-                answers[q['field']] = result['value']
+                answers[q.field] = result['value']
                 messages.append({"role": "assistant", "content": result['value']})
-                skip = skipped_questions(q['field'], answers)
-                return _next_step_response(answers, messages, question_index + 1 + skip, 0, attempt_counter)
+                return _next_step_response(answers, messages, skip_rules.next_index(question_index, answers), 0, attempt_counter)
             
             elif result['status'] == "INVALID":
                 return {
@@ -375,15 +557,7 @@ def chat_step(state: dict, user_input: str) -> dict:
                 }
 
             elif result['status'] == "QUESTION":
-                user_question = messages[-1]['content']
-                if is_immigration_question(user_question):
-                    response = call_llm(messages, messages[-2]['content'])
-                else:
-                    general_context = [
-                        {"role": "system", "content": f"The user was asked: {q['text']}"},
-                        {"role": "user", "content": user_question}
-                    ]
-                    response = general_llm(general_context)
+                response = answer_question(q, messages)
                 return {
                     "reply": response,
                     "state": state,
@@ -391,7 +565,7 @@ def chat_step(state: dict, user_input: str) -> dict:
                 }
         else:
             if len(user_input.split()) <= 10:
-                corrections = suggest_typo_correction(user_input)
+                corrections = suggest_typo_correction(user_input, q.field, q.kind)
                 if corrections:
                     suggestions = ', '.join([f"'{w}' → '{c}'" for w, c in corrections])
                     return {
@@ -399,9 +573,8 @@ def chat_step(state: dict, user_input: str) -> dict:
                     "state": state,
                     "done": False
                     }
-            answers[q['field']] = user_input
-            skip = skipped_questions(q['field'], answers)
-            return _next_step_response(answers, messages, question_index + 1 + skip, 0, attempt_counter)
+            answers[q.field] = user_input
+            return _next_step_response(answers, messages, skip_rules.next_index(question_index, answers), 0, attempt_counter)
 
     except Exception as e:
         logging.error("🔥 Error in chat_step():")
@@ -412,7 +585,121 @@ def chat_step(state: dict, user_input: str) -> dict:
             "done": False
         }
 
+def edit_answer(state: dict, field: str, value: str, position: int = None) -> dict:
+    """
+    Changes an earlier answer and recomputes only the part of the question
+    path that depends on it. Answers of questions the new path skips, and
+    autofills whose rule no longer applies, are removed. The conversation
+    continues at the first question on the new path that has no answer.
+    Answers that are still on the path are kept as they are, without
+    re-validating them.
+
+    A field asked by more than one question (minor_status) needs the
+    `position` of the question being edited.
+    """
+    answers = state.get("answers", {})
+    messages = state.get("messages", [])
+    attempt_counter = state.get("attempt_counter", {})
+
+    positions = [q.position for q in questions if q.field == field]
+    if not positions or field not in answers:
+        return {"reply": f"❌ '{field}' has not been answered yet.", "state": state, "done": False}
+    if position is None and len(positions) > 1:
+        return {"reply": f"❌ '{field}' is asked more than once, give the position of the question to edit: "
+                         f"{', '.join(map(str, positions))}", "state": state, "done": False}
+    if position is not None and position not in positions:
+        return {"reply": f"❌ Question {position} doesn't ask '{field}'.", "state": state, "done": False}
+    q = questions[positions[0] if position is None else position]
+
+    # Same local checks chat_step applies, nothing that needs the network
+    if q.options and value.lower() not in q.options_lower:
+        return {"reply": f"❌ Please enter one of the valid options: {' or '.join(q.options)}", "state": state, "done": False}
+    if q.kind == "date":
+        is_valid, result = is_valid_date(value, no_future_allowed=q.no_future_allowed, no_past_allowed=q.no_past_allowed)
+        if not is_valid:
+            return {"reply": f"❌ {result}", "state": state, "done": False}
+        value = result.strftime('%Y-%m-%d')
+    if q.kind == "phone":
+        is_valid_phone, _, fields_to_clear = validate_full_phone_number({**answers, field: value}, field)
+        # Incomplete numbers are checked when the rest of them is answered
+        if not is_valid_phone and fields_to_clear:
+            return {"reply": "❌ Invalid phone number. Please re-enter.", "state": state, "done": False}
+
+    old_visited, old_autofilled, _ = _walk_path(q.position, dict(answers))
+
+    answers[field] = value
+    for autofilled_field in old_autofilled:
+        answers.pop(autofilled_field, None)
+    unconfirmed = set()
+    for derived, (recompute, sources) in DERIVED_ANSWERS.items():
+        if field in sources and derived in answers:
+            derived_value = recompute(answers)
+            if derived_value is None:
+                # Needs the user's confirmation, asked when the path gets there
+                del answers[derived]
+                unconfirmed.add(derived)
+            else:
+                answers[derived] = derived_value
+
+    new_visited, new_autofilled, next_index = _walk_path(q.position, answers)
+
+    off_path = {questions[p].field for p in old_visited} - {questions[p].field for p in new_visited}
+    invalidated = sorted((off_path - new_autofilled) | (old_autofilled - new_autofilled) | unconfirmed)
+    for stale_field in off_path - new_autofilled:
+        answers.pop(stale_field, None)
+
+    response = _next_step_response(answers, messages, next_index, 0, attempt_counter)
+    response["invalidated"] = invalidated
+    return response
+
+
 """Helper functions"""
+# Answers chat_step computes from other answers: field -> (recompute, source fields).
+# None means the answer can't be computed without asking the user.
+DERIVED_ANSWERS = {
+    'school_dli#': (lambda answers: find_dli(answers.get('school_name', ''), answers.get('school_city', ''))[0],
+                    ('school_name', 'school_city')),
+}
+
+
+def _ends_form_early(q, answers):
+    return q.field == 'travel_start_date' and 'chin' in answers.get('citizenship', '').lower()
+
+
+def _walk_path(position, answers):
+    """
+    Follows the question path from `position` to the end of the form,
+    applying skip rules and their autofills to `answers`. Unanswered
+    questions are stepped over without skipping, since their rules can't
+    be evaluated yet.
+
+    Returns:
+        visited: positions of the answered questions on the path
+        autofilled: fields filled in by skip rules along the way
+        stop: position of the first unanswered question (or the end)
+    """
+    visited, autofilled, stop = [], set(), None
+    while position < len(questions):
+        q = questions[position]
+        if _ends_form_early(q, answers):
+            break
+        if q.field not in answers:
+            if stop is None:
+                stop = position
+            position += 1
+            continue
+        visited.append(position)
+        matched = skip_rules.match(position, answers)
+        if matched is None:
+            position += 1
+            continue
+        position, autofill = matched
+        for fill_field, source in autofill:
+            answers[fill_field] = answers.get(source, '')
+            autofilled.add(fill_field)
+    return visited, autofilled, len(questions) if stop is None else stop
+
+
 def _next_step_response(answers, messages, question_index, skip, attempt_counter):
     if question_index >= len(questions):
         return {
@@ -428,7 +715,7 @@ def _next_step_response(answers, messages, question_index, skip, attempt_counter
         }
 
     return {
-        "reply": questions[question_index]["text"],
+        "reply": questions[question_index].text,
         "state": {
             "answers": answers,
             "messages": messages,
@@ -448,29 +735,15 @@ def handle_loc_date_phone_question(q, user_input, messages):
         handled (bool): True if handled as question and printed response.
         continue_loop (bool): True if caller should ask for input again.
     """
-    is_loc_date_phone = (
-            'location' in q['field'] or
-            'date' in q['field'] or
-            any(suffix in q['field'] for suffix in
-                ['phone', '_phone_number', '_phone_country_code', '_phone_extension', '_full_phone_number'])
-    )
-
-    if is_loc_date_phone and user_input.strip().endswith('?'):
-        messages.append({"role": "system", "content": q['text']})
+    if q.asks_loc_date_phone and user_input.strip().endswith('?'):
+        messages.append({"role": "system", "content": q.text})
         messages.append({"role": "user", "content": user_input})
+        messages[:] = compact_history(messages, q.text)
 
-        result = validate_with_llm(messages)
+        result = validate_answer(q, user_input, messages)
 
         if result['status'] == "QUESTION":
-            user_question = messages[-1]['content']
-            if is_immigration_question(user_question):
-                response = call_llm(messages, messages[-2]['content'])
-            else:
-                general_context = [
-                    {"role": "system", "content": f"The user was asked: {q['text']}"},
-                    {"role": "user", "content": user_question}
-                ]
-                response = general_llm(general_context)
+            response = answer_question(q, messages)
             print(response)
             return True, True  # handled, continue asking input
         else:
@@ -479,20 +752,28 @@ def handle_loc_date_phone_question(q, user_input, messages):
 
     return False, False
 
-def save_state(state, filename="state.json"):
-    with open(filename, "w") as f:
-        json.dump(state, f)
+def save_state(state, filename="state.json", binary=None):
+    """Saves JSON to .json files and the compact encoding otherwise, unless `binary` says which."""
+    if binary is None:
+        binary = not filename.endswith(".json")
+    if binary:
+        with open(filename, "wb") as f:
+            f.write(state_codec.encode(state))
+    else:
+        with open(filename, "w") as f:
+            json.dump(state, f)
 
 def load_state(filename="state.json"):
+    """Loads a state saved in either format."""
     if os.path.exists(filename):
-        with open(filename, "r") as f:
-            return json.load(f)
+        with open(filename, "rb") as f:
+            return state_codec.loads(f.read())
     return {"answers": {}, "messages": [], "question_index": 0, "skip": 0}
 
 if __name__ == "__main__":
     state = load_state()
     if state["question_index"] < len(questions):
-        print(questions[state["question_index"]]["text"])
+        print(questions[state["question_index"]].text)
 
     while True:
         user_input = input("> ")
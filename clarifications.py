@@ -0,0 +1,59 @@
+"""
+Precomputed clarifications for every form question.
+
+When call_llm has nothing better to search for it explains the current
+question, and for vague follow-ups like "what does this mean?" that is all the
+user wants. Both answers only depend on the question, so they are generated
+offline by trainning/precompute_clarifications.py and served from this table.
+"""
+import json
+import os
+import re
+
+CLARIFICATIONS_PATH = "others/default_clarifications.json"
+DEFAULT_QUERY_PREFIX = "Explain this question in further detail to the user: "
+
+GENERIC_QUESTION_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in [
+        r"^(what|wdym|huh)\W*$",
+        r"^what (does|do) (this|that|it|you) mean\W*$",
+        r"^what do you mean( by (this|that))?\W*$",
+        r"^what is (this|that)( question)?( asking| about)?( for)?\W*$",
+        r"^(can|could) you (please )?(explain|clarify)( (this|that|it|the question))?( (please|more))?\W*$",
+        r"^(please )?(explain|clarify)( (this|that|it|the question))?( (please|more))?\W*$",
+        r"^i (don'?t|do not) understand( (this|that|the question))?\W*$",
+        r"^what should i (put|write|answer|enter)( here)?\W*$",
+    ]
+]
+
+
+def default_query(question_text):
+    return DEFAULT_QUERY_PREFIX + question_text
+
+
+def is_generic_question(text):
+    """True if the user is asking about the question as a whole."""
+    text = text.strip()
+    return any(pattern.match(text) for pattern in GENERIC_QUESTION_PATTERNS)
+
+
+def load_clarifications(version=None, path=CLARIFICATIONS_PATH):
+    """
+    Returns {field: entry}. The table is ignored if it was built against a
+    different document store version.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        table = json.load(f)
+    if table.get("store_version") != version:
+        print(f"⚠️ {path} was built for another document store version, ignoring it.")
+        return {}
+    return table["questions"]
+
+
+def save_clarifications(entries, version=None, path=CLARIFICATIONS_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"store_version": version, "questions": entries}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
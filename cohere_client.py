@@ -0,0 +1,198 @@
+"""
+Shared Cohere client.
+
+Every module gets its client from get_client() instead of building its own,
+so all calls go through the same:
+  - pooled HTTP connections (one httpx.Client per process),
+  - per-call deadline covering every retry attempt,
+  - retries with jittered exponential backoff on 429, 5xx and network errors,
+  - token-bucket rate limiter per endpoint, sized to the account quota.
+
+The HTTP transport is pluggable: set COHERE_BASE_URL to point the client at a
+local stub server (see trainning/cohere_stub_server.py), or pass an
+httpx transport to get_client() in tests and benchmarks.
+"""
+import os
+import random
+import threading
+import time
+
+import cohere
+import httpx
+from cohere.core.api_error import ApiError
+
+# Calls per minute allowed for each endpoint, override with COHERE_<ENDPOINT>_PER_MINUTE
+RATE_LIMITS = {
+    "chat": 500,
+    "embed": 2000,
+    "rerank": 1000,
+    "tokenize": 2000,
+}
+DEFAULT_DEADLINE = 30
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_CONNECTIONS = 20
+
+
+class TokenBucket:
+    """Allows `rate` calls per second with bursts of up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=None):
+        """Blocks until a token is available. Returns False if timeout runs out first."""
+        give_up = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return True
+                wait = (1 - self._tokens) / self.rate
+            if give_up is not None and now + wait > give_up:
+                return False
+            time.sleep(wait)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def _is_retryable(error):
+    if isinstance(error, ApiError):
+        return error.status_code in RETRY_STATUS
+    return isinstance(error, httpx.TransportError)
+
+
+class ResilientClient:
+    """Wraps a cohere client, same call signatures plus an optional `deadline`."""
+
+    def __init__(self, client, limiters, deadline=DEFAULT_DEADLINE, max_retries=MAX_RETRIES):
+        self._client = client
+        self._limiters = limiters
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.stats = {"calls": 0, "retries": 0, "failures": 0, "throttled_seconds": 0.0}
+        # Flask serves requests from several threads
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            self.stats[name] += amount
+
+    def _call(self, endpoint, kwargs):
+        deadline = kwargs.pop("deadline", None) or self.deadline
+        give_up = time.monotonic() + deadline
+        request_options = dict(kwargs.pop("request_options", None) or {})
+        limiter = self._limiters.get(endpoint)
+        method = getattr(self._client, endpoint)
+
+        attempt = 0
+        while True:
+            if limiter is not None:
+                start = time.monotonic()
+                if not limiter.acquire(timeout=give_up - start):
+                    raise DeadlineExceeded(f"Cohere {endpoint}: rate limit wait exceeded the {deadline}s deadline")
+                self._count("throttled_seconds", time.monotonic() - start)
+
+            remaining = give_up - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded(f"Cohere {endpoint}: no time left in the {deadline}s deadline")
+            options = dict(request_options)
+            options["timeout_in_seconds"] = max(1, int(min(remaining, options.get("timeout_in_seconds", remaining))))
+
+            self._count("calls")
+            try:
+                return method(request_options=options, **kwargs)
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self._count("failures")
+                    raise
+                # Full jitter: sleep anywhere up to the exponential backoff
+                backoff = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                if time.monotonic() + backoff >= give_up:
+                    self._count("failures")
+                    raise
+                attempt += 1
+                self._count("retries")
+                time.sleep(backoff)
+
+    def chat(self, **kwargs):
+        return self._call("chat", kwargs)
+
+    def embed(self, **kwargs):
+        return self._call("embed", kwargs)
+
+    def rerank(self, **kwargs):
+        return self._call("rerank", kwargs)
+
+    def tokenize(self, **kwargs):
+        return self._call("tokenize", kwargs)
+
+    def __getattr__(self, name):
+        # Anything else goes straight to the wrapped client
+        return getattr(self._client, name)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+_http_client = None
+_limiters = None
+
+
+def _rate_limiters():
+    limiters = {}
+    for endpoint, per_minute in RATE_LIMITS.items():
+        per_minute = int(os.environ.get(f"COHERE_{endpoint.upper()}_PER_MINUTE", per_minute))
+        # Burst of up to a tenth of the per-minute quota
+        limiters[endpoint] = TokenBucket(per_minute / 60, max(1, per_minute // 10))
+    return limiters
+
+
+def get_client(api_key=None, v1=False, transport=None, base_url=None):
+    """
+    Returns the shared client for this API key.
+
+    Args:
+        api_key: Cohere key, defaults to COHERE_API_KEY
+        v1: return the legacy cohere.Client API instead of ClientV2
+        transport: httpx transport to use instead of the network (tests)
+        base_url: API root, defaults to COHERE_BASE_URL or the Cohere API
+    """
+    global _http_client, _limiters
+    api_key = api_key or os.environ.get("COHERE_API_KEY")
+    base_url = base_url or os.environ.get("COHERE_BASE_URL")
+
+    with _clients_lock:
+        key = (api_key, v1, base_url, id(transport) if transport else None)
+        if key in _clients:
+            return _clients[key]
+
+        if transport is not None:
+            http_client = httpx.Client(transport=transport)
+        else:
+            if _http_client is None:
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_CONNECTIONS),
+                    timeout=DEFAULT_DEADLINE,
+                )
+            http_client = _http_client
+        if _limiters is None:
+            _limiters = _rate_limiters()
+
+        client_class = cohere.Client if v1 else cohere.ClientV2
+        options = {"httpx_client": http_client, "max_retries": 0}
+        if base_url:
+            options["base_url"] = base_url
+        client = ResilientClient(client_class(api_key, **options), _limiters)
+        _clients[key] = client
+        return client
@@ -0,0 +1,272 @@
+"""
+In-memory DLI lookup.
+
+The school sheet is read once into a dict keyed by the normalized
+(school, city) pair. The parsed table is cached next to the sheet and
+rebuilt when the sheet changes; a running process picks up a changed sheet
+on its next lookup and swaps in the new table in one assignment, so
+concurrent lookups see either the old or the new table, never a mix.
+
+Names that don't match exactly are looked up in a trigram index of the
+school names. Candidates sharing trigrams with the query are rescored by
+edit-distance similarity of the school and city names, and the best one is
+accepted automatically only if its school name alone is close and it is
+clearly ahead of the next school. A matching city never makes up for a
+different school; such candidates are left for the user to confirm.
+"""
+import os
+import pickle
+import re
+import threading
+import time
+import unicodedata
+from difflib import SequenceMatcher
+
+import numpy as np
+import pandas as pd
+
+DLI_PATH = "trainning/School Information.xlsx"
+COMPILED_SUFFIX = ".compiled.pickle"
+# Bump when the key normalization or the cached layout changes
+TABLE_VERSION = 1
+# How often a running process checks the sheet for changes
+CHECK_INTERVAL = 5.0
+NO_MATCH = "No match found."
+
+# Fuzzy matching
+AUTO_ACCEPT = 0.85
+# Required lead of the best candidate over the next one with other DLI numbers
+AUTO_ACCEPT_MARGIN = 0.05
+CITY_WEIGHT = 0.3
+# Schools rescored by edit distance after the trigram pass
+RESCORE_CANDIDATES = 10
+ABBREVIATIONS = {
+    "univ": "university", "uni": "university", "u": "university",
+    "coll": "college", "col": "college", "inst": "institute", "acad": "academy",
+    "intl": "international", "sch": "school", "st": "saint", "ste": "sainte",
+    "mt": "mount", "ctr": "centre", "center": "centre", "&": "and",
+}
+NOISE_WORDS = {"inc", "ltd", "the"}
+# 'O19305471522', a few older numbers have 13 digits
+DLI_NUMBER = re.compile(r"O\d{11,13}", re.IGNORECASE)
+
+
+def is_dli_number(text):
+    return DLI_NUMBER.fullmatch(text.strip()) is not None
+
+
+def normalize(text):
+    """' Academy of  Learning ' -> 'academy of learning'"""
+    return re.sub(r"\s+", " ", str(text)).strip().lower()
+
+
+def fuzzy_key(text):
+    """'Univ. of Montréal Inc.' -> 'university of montreal'"""
+    text = unicodedata.normalize("NFKD", normalize(text))
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    words = re.findall(r"[a-z0-9]+|&", text.replace("’", "'").replace("'", ""))
+    return " ".join(ABBREVIATIONS.get(w, w) for w in words if w not in NOISE_WORDS)
+
+
+def trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _scorer(query):
+    """Edit-distance similarity to `query`, reusing the matcher's tables of the query."""
+    matcher = SequenceMatcher(None, autojunk=False)
+    matcher.set_seq2(query)
+
+    def score(candidate):
+        if candidate == query:
+            return 1.0
+        matcher.set_seq1(candidate)
+        return matcher.ratio()
+    return score
+
+
+class TrigramIndex:
+    def __init__(self, table):
+        # One entry per distinct school name, with the cities it is in
+        cities = {}
+        for school, city in table:
+            cities.setdefault(school, []).append(city)
+        self.schools = list(cities)
+        self.cities = [cities[school] for school in self.schools]
+        self.keys = [fuzzy_key(school) for school in self.schools]
+        self.city_keys = [[fuzzy_key(city) for city in c] for c in self.cities]
+
+        postings = {}
+        sizes = []
+        for i, key in enumerate(self.keys):
+            grams = trigrams(key)
+            sizes.append(len(grams))
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.array(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.sizes = np.array(sizes, dtype=np.float32)
+
+    def schools_like(self, school_key, n=RESCORE_CANDIDATES):
+        """Positions of the n schools with the highest trigram Dice coefficient."""
+        grams = trigrams(school_key)
+        hits = [self.postings[g] for g in grams if g in self.postings]
+        if not hits:
+            return []
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.schools))
+        dice = 2 * shared / (len(grams) + self.sizes)
+        n = min(n, int(np.count_nonzero(shared)))
+        best = np.argpartition(-dice, n - 1)[:n]
+        return best[np.argsort(-dice[best])]
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return TABLE_VERSION, stat.st_size, stat.st_mtime_ns
+
+
+def build_table(path):
+    """Reads the sheet into {(school, city): [DLI #, ...]}."""
+    df = pd.read_excel(path, dtype=str)
+    # The sheet's header is 'DLI # ' with a trailing space
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.dropna(subset=["School", "City", "DLI #"])
+
+    table = {}
+    for school, city, dli in zip(df["School"], df["City"], df["DLI #"]):
+        numbers = table.setdefault((normalize(school), normalize(city)), [])
+        dli = dli.strip()
+        if dli not in numbers:
+            numbers.append(dli)
+    return {key: tuple(numbers) for key, numbers in table.items()}
+
+
+def load_table(path=DLI_PATH):
+    """
+    Returns (signature, table), using the cached table if it matches the sheet.
+    """
+    compiled_path = path + COMPILED_SUFFIX
+    signature = _source_signature(path)
+    try:
+        with open(compiled_path, "rb") as f:
+            cached_signature, table = pickle.load(f)
+        if cached_signature == signature:
+            return signature, table
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        pass
+
+    table = build_table(path)
+
+    tmp_path = f"{compiled_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump((signature, table), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, compiled_path)
+    except OSError as e:
+        print(f"⚠️ Could not cache the DLI table: {e}")
+    return signature, table
+
+
+class DLIIndex:
+    def __init__(self, path=DLI_PATH, check_interval=CHECK_INTERVAL):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._install(*load_table(path))
+        self._checked = time.monotonic()
+
+    def _install(self, signature, table):
+        # Built before the swap so lookups never see a table without its index
+        trigram_index = TrigramIndex(table)
+        self._signature, self._state = signature, (table, trigram_index)
+
+    def _refresh(self):
+        """Reloads the table if the sheet changed since it was loaded."""
+        now = time.monotonic()
+        if now - self._checked < self.check_interval:
+            return
+        # Only one thread stats and rebuilds, the others keep using the current table
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked = now
+            try:
+                if _source_signature(self.path) == self._signature:
+                    return
+                signature, table = load_table(self.path)
+            except Exception as e:
+                print(f"⚠️ Keeping the current DLI table, reload failed: {e}")
+                return
+            self._install(signature, table)
+            print(f"🔄 Reloaded {len(table)} schools from {self.path}")
+        finally:
+            self._lock.release()
+
+    def lookup(self, school_name, city_name):
+        """DLI numbers of the school in the city, empty if there is none."""
+        self._refresh()
+        table, _ = self._state
+        return list(table.get((normalize(school_name), normalize(city_name)), ()))
+
+    def search(self, school_name, city_name="", k=5):
+        """
+        Closest (school, city) entries to a misspelled or abbreviated name.
+
+        Returns:
+            list of {"school", "city", "dli", "score", "school_score"} dicts,
+            best first. Scores are in [0, 1], 1 being an exact match;
+            "school_score" compares the school names only.
+        """
+        self._refresh()
+        table, trigram_index = self._state
+        school_key, city_key = fuzzy_key(school_name), fuzzy_key(city_name)
+        if not school_key:
+            return []
+
+        school_similarity, city_similarity = _scorer(school_key), _scorer(city_key)
+        candidates = []
+        city_scores = {}
+        for i in trigram_index.schools_like(school_key):
+            school = trigram_index.schools[i]
+            school_score = school_similarity(trigram_index.keys[i])
+            for city, key in zip(trigram_index.cities[i], trigram_index.city_keys[i]):
+                score = school_score
+                if city_key:
+                    if key not in city_scores:
+                        city_scores[key] = city_similarity(key)
+                    score = (1 - CITY_WEIGHT) * school_score + CITY_WEIGHT * city_scores[key]
+                candidates.append({
+                    "school": school,
+                    "city": city,
+                    "dli": list(table[(school, city)]),
+                    "score": round(score, 4),
+                    "school_score": round(school_score, 4),
+                })
+        candidates.sort(key=lambda c: -c["score"])
+        return candidates[:k]
+
+    def best_match(self, school_name, city_name=""):
+        """
+        Returns:
+            dli: DLI numbers of the exact match, or of the best fuzzy match if
+                it is confident enough to accept without asking, else empty
+            candidates: the search() results looked at, for the user to
+                confirm when dli is empty (empty after an exact match)
+        """
+        exact = self.lookup(school_name, city_name)
+        if exact:
+            return exact, []
+
+        candidates = self.search(school_name, city_name)
+        if not candidates or candidates[0]["school_score"] < AUTO_ACCEPT:
+            return [], candidates
+        best = candidates[0]
+        for other in candidates[1:]:
+            if other["dli"] != best["dli"]:
+                if best["score"] - other["score"] < AUTO_ACCEPT_MARGIN:
+                    return [], candidates
+                break
+        return best["dli"], candidates
+
+    def __len__(self):
+        return len(self._state[0])
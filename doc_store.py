@@ -0,0 +1,137 @@
+"""
+Versioned on-disk store for the retrieval corpus.
+
+Layout of a store directory:
+    manifest.json   format version, checksum, dimension, document count, model
+    embeddings.npy  float32 matrix, one row per document (memory-mapped)
+    docs.bin        UTF-8 JSON documents written back to back
+    offsets.npy     int64 byte offsets into docs.bin, one more than documents
+
+Opening a store maps the files read-only, so every worker process shares the
+same pages through the OS cache and a document is only parsed when it is read.
+"""
+import hashlib
+import json
+import mmap
+import os
+import shutil
+import numpy as np
+
+STORE_DIR = "others/doc_store"
+FORMAT_VERSION = 1
+
+
+class StoreError(Exception):
+    pass
+
+
+class Documents:
+    """Read-only sequence of documents backed by docs.bin."""
+
+    def __init__(self, blob, offsets):
+        self._blob = blob
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("document index out of range")
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._blob[start:end].decode("utf-8"))
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+
+class DocStore:
+    def __init__(self, path, manifest, embeddings, documents):
+        self.path = path
+        self.manifest = manifest
+        self.embeddings = embeddings
+        self.documents = documents
+
+    @property
+    def version(self):
+        """Changes whenever the embeddings or documents change."""
+        return self.manifest["checksum"]
+
+    @classmethod
+    def open(cls, path=STORE_DIR):
+        manifest_file = os.path.join(path, "manifest.json")
+        if not os.path.exists(manifest_file):
+            raise StoreError(f"No document store at {path}. Build it with trainning/build_doc_store.py.")
+
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format_version") != FORMAT_VERSION:
+            raise StoreError(f"Unsupported document store format: {manifest.get('format_version')}")
+
+        embeddings = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+        offsets = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")
+        if embeddings.shape != (manifest["n_docs"], manifest["dimension"]) or len(offsets) != manifest["n_docs"] + 1:
+            raise StoreError(f"Document store at {path} does not match its manifest.")
+
+        with open(os.path.join(path, "docs.bin"), "rb") as f:
+            blob = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b""
+
+        return cls(path, manifest, embeddings, Documents(blob, offsets))
+
+    def verify(self):
+        """Recomputes the checksum, returns True if the files are intact."""
+        return _checksum(self.path) == self.manifest["checksum"]
+
+
+def _checksum(path):
+    digest = hashlib.sha256()
+    for name in ("embeddings.npy", "docs.bin", "offsets.npy"):
+        with open(os.path.join(path, name), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_store(embeddings, documents, model, path=STORE_DIR):
+    """
+    Writes a new store. Files are written into a sibling directory first and
+    swapped in at the end, so readers never see a half-written store.
+    """
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2 or embeddings.shape[0] != len(documents):
+        raise StoreError(f"Got {embeddings.shape[0]} embeddings for {len(documents)} documents.")
+
+    tmp_path = path + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    np.save(os.path.join(tmp_path, "embeddings.npy"), embeddings)
+
+    offsets = [0]
+    with open(os.path.join(tmp_path, "docs.bin"), "wb") as f:
+        for doc in documents:
+            encoded = json.dumps(doc, ensure_ascii=False).encode("utf-8")
+            f.write(encoded)
+            offsets.append(offsets[-1] + len(encoded))
+    np.save(os.path.join(tmp_path, "offsets.npy"), np.array(offsets, dtype=np.int64))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "checksum": _checksum(tmp_path),
+        "n_docs": embeddings.shape[0],
+        "dimension": embeddings.shape[1],
+        "model": model,
+    }
+    with open(os.path.join(tmp_path, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    old_path = path + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.rename(path, old_path)
+    os.rename(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return manifest
@@ -0,0 +1,169 @@
+"""
+Two-tier cache for query embeddings.
+
+Tier 1 is an in-process LRU, tier 2 is a SQLite file shared by all workers.
+Keys are the embed model, the input type and the normalized query text, so
+"What is a DLI?" and "what is a dli" share one entry. Both tiers evict least
+recently used entries once they grow past their byte budget. The SQLite
+tier keeps its size in a one-row table updated with every insert and
+delete, so a put doesn't have to add up the whole table. Disk hits update
+last_used in batches, with the next put or every TOUCH_BATCH hits.
+"""
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+CACHE_PATH = "others/embedding_cache.sqlite3"
+# Disk hits whose last_used is written in one transaction
+TOUCH_BATCH = 64
+
+
+def normalize_query(text):
+    text = re.sub(r"\s+", " ", text.strip().lower())
+    return text.rstrip("?!. ")
+
+
+def cache_key(text, model, input_type):
+    raw = f"{model}\x00{input_type}\x00{normalize_query(text)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path=CACHE_PATH, max_memory_bytes=16 << 20, max_disk_bytes=256 << 20):
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        # key -> time of disk hits not written to last_used yet
+        self._touched = {}
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "key TEXT PRIMARY KEY, vector BLOB NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used)")
+            # Bytes of all vectors, shared by the workers like the table itself
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS disk_size (id INTEGER PRIMARY KEY CHECK (id = 0), bytes INTEGER NOT NULL)"
+            )
+            self._db.execute("INSERT OR IGNORE INTO disk_size (id, bytes) VALUES (0, 0)")
+            self._db.commit()
+
+    def _remember(self, key, vector):
+        if key in self._memory:
+            self._memory_bytes -= self._memory.pop(key).nbytes
+        self._memory[key] = vector
+        self._memory_bytes += vector.nbytes
+        while self._memory_bytes > self.max_memory_bytes and len(self._memory) > 1:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= evicted.nbytes
+
+    def get(self, key):
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return vector
+
+            if self._db is not None:
+                row = self._db.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                if row:
+                    self._touched[key] = time.time()
+                    if len(self._touched) >= TOUCH_BATCH:
+                        self._write_touched()
+                        self._db.commit()
+                    vector = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, vector)
+                    self.stats["disk_hits"] += 1
+                    return vector
+
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, key, vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+            if self._db is not None:
+                data = vector.tobytes()
+                # Other workers write the same file, the size read and its update must not interleave
+                self._db.execute("BEGIN IMMEDIATE")
+                try:
+                    row = self._db.execute("SELECT LENGTH(vector) FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)",
+                        (key, data, time.time()),
+                    )
+                    self._db.execute(
+                        "UPDATE disk_size SET bytes = bytes + ? WHERE id = 0", (len(data) - (row[0] if row else 0),)
+                    )
+                    # Pending hits count before choosing what to evict
+                    self._write_touched()
+                    self._evict_disk()
+                    self._db.commit()
+                except BaseException:
+                    self._db.rollback()
+                    raise
+
+    def _write_touched(self):
+        self._db.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE key = ?", [(t, key) for key, t in self._touched.items()]
+        )
+        self._touched.clear()
+
+    def disk_bytes(self):
+        return self._db.execute("SELECT bytes FROM disk_size WHERE id = 0").fetchone()[0]
+
+    def _evict_disk(self):
+        total = self.disk_bytes()
+        if total <= self.max_disk_bytes:
+            return
+        stale = []
+        rows = self._db.execute("SELECT key, LENGTH(vector) FROM embeddings ORDER BY last_used")
+        for key, size in rows:
+            if total <= self.max_disk_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        rows.close()
+        self._db.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+        self._db.execute("UPDATE disk_size SET bytes = ? WHERE id = 0", (total,))
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
+
+    def embed(self, client, texts, model, input_type):
+        """
+        Returns a float32 matrix with one embedding per text. Only the texts
+        missing from the cache are sent to the embed endpoint, in one call.
+        """
+        keys = [cache_key(text, model, input_type) for text in texts]
+        vectors = [self.get(key) for key in keys]
+
+        missing = [i for i, vector in enumerate(vectors) if vector is None]
+        if missing:
+            fetched = client.embed(
+                model=model,
+                input_type=input_type,
+                texts=[texts[i] for i in missing],
+                embedding_types=["float"],
+            ).embeddings.float
+            for i, vector in zip(missing, fetched):
+                vectors[i] = np.asarray(vector, dtype=np.float32)
+                self.put(keys[i], vectors[i])
+
+        return np.vstack(vectors)
@@ -0,0 +1,71 @@
+"""
+Offline gazetteer of countries and major cities.
+
+trainning/gazetteer.json lists the ISO 3166 countries with their common
+aliases ("USA", "Ivory Coast", "Holland") and a table of major cities with
+their country. Names are matched after folding case, accents and
+punctuation, so "U.S.A." and "Côte d'Ivoire" need no geocoder call.
+"""
+import json
+import re
+import unicodedata
+
+GAZETTEER_PATH = "trainning/gazetteer.json"
+
+
+def place_key(text):
+    """'  Côte d'Ivoire. ' -> 'cote divoire'"""
+    text = unicodedata.normalize("NFKD", str(text).casefold())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    text = re.sub(r"[.'’]", "", text)
+    text = re.sub(r"[^a-z0-9&]+", " ", text).strip()
+    return re.sub(r"^the ", "", text)
+
+
+class Gazetteer:
+    def __init__(self, countries, cities):
+        self._countries = {}
+        self._codes = {country["code"]: country for country in countries}
+        for country in countries:
+            for name in (country["name"], *country["aliases"]):
+                self._countries.setdefault(place_key(name), country)
+
+        # A city name can exist in several countries, e.g. London or Hyderabad
+        self._cities = {}
+        for city in cities:
+            for name in (city["name"], *city["aliases"]):
+                self._cities.setdefault(place_key(name), []).append(city)
+
+    def country(self, text):
+        """The country record ({"code", "alpha3", "name", "aliases"}) named by `text`, or None."""
+        return self._countries.get(place_key(text))
+
+    def country_by_code(self, code):
+        """The country record with ISO 3166 alpha-2 code `code`, or None."""
+        return self._codes.get(code.upper())
+
+    def city(self, text):
+        """
+        The city record ({"name", "country", "aliases"}) named by `text`, or
+        None. "Lagos, Nigeria" picks the Lagos in Nigeria.
+        """
+        name, _, rest = text.partition(",")
+        matches = self._cities.get(place_key(name))
+        if not matches:
+            return None
+        country = self.country(rest.split(",")[-1]) if rest.strip() else None
+        if country is None:
+            return matches[0] if not rest.strip() else None
+        for city in matches:
+            if city["country"] == country["code"]:
+                return city
+        return None
+
+    def __len__(self):
+        return len(self._countries) + len(self._cities)
+
+
+def load_gazetteer(path=GAZETTEER_PATH):
+    with open(path, "r", encoding="utf-8") as f:
+        raw = json.load(f)
+    return Gazetteer(raw["countries"], raw["cities"])
@@ -0,0 +1,126 @@
+"""
+Two-tier cache for forward-geocode results.
+
+Tier 1 is an in-process LRU, tier 2 is a SQLite file shared by all workers.
+Keys are the normalized query, so " Lagos,Nigeria " and "lagos, nigeria"
+share one entry. Addresses that were not found are cached too, with a
+shorter TTL, so a misspelled country doesn't reach the geocoder on every
+retry. Only definitive answers from the geocoder are cached, never errors.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+GEOCODE_CACHE_PATH = "others/geocode_cache.sqlite3"
+GEOCODE_TTL = 30 * 24 * 3600
+NOT_FOUND_TTL = 24 * 3600
+# Returned by get() when the cache has nothing for the query
+MISS = object()
+
+
+def normalize_address(text):
+    text = re.sub(r"\s*,\s*", ", ", text.strip().lower())
+    text = re.sub(r"\s+", " ", text)
+    return text.strip(" ,.")
+
+
+class GeocodeCache:
+    def __init__(self, path=GEOCODE_CACHE_PATH, max_memory_entries=4096, max_disk_entries=200_000,
+                 ttl=GEOCODE_TTL, not_found_ttl=NOT_FOUND_TTL):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self.not_found_ttl = not_found_ttl
+        # key -> (result or None if not found, expiry time)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "not_found_hits": 0, "misses": 0, "expired": 0}
+
+        self._db = None
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS geocodes ("
+                "key TEXT PRIMARY KEY, result TEXT, expires REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS geocodes_last_used ON geocodes (last_used)")
+            self._db.commit()
+
+    def _remember(self, key, result, expires):
+        self._memory[key] = (result, expires)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _hit(self, result, tier):
+        self.stats[tier] += 1
+        if result is None:
+            self.stats["not_found_hits"] += 1
+        return result
+
+    def get(self, query):
+        """
+        The cached geocode of `query`: the address dict, None if the geocoder
+        found nothing, or MISS if there is no fresh entry.
+        """
+        key = normalize_address(query)
+        now = time.time()
+        with self._lock:
+            # Counted once per lookup that only found stale entries
+            expired = False
+            entry = self._memory.get(key)
+            if entry is not None:
+                result, expires = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    return self._hit(result, "memory_hits")
+                del self._memory[key]
+                expired = True
+
+            if self._db is not None:
+                row = self._db.execute("SELECT result, expires FROM geocodes WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    self._db.execute("UPDATE geocodes SET last_used = ? WHERE key = ?", (now, key))
+                    self._db.commit()
+                    result = json.loads(row[0]) if row[0] is not None else None
+                    self._remember(key, result, row[1])
+                    return self._hit(result, "disk_hits")
+                expired = expired or row is not None
+
+            self.stats["expired"] += expired
+            self.stats["misses"] += 1
+            return MISS
+
+    def put(self, query, result):
+        """Caches the geocode of `query`, None meaning the geocoder found nothing."""
+        key = normalize_address(query)
+        now = time.time()
+        expires = now + (self.ttl if result is not None else self.not_found_ttl)
+        with self._lock:
+            self._remember(key, result, expires)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO geocodes (key, result, expires, last_used) VALUES (?, ?, ?, ?)",
+                    (key, json.dumps(result) if result is not None else None, expires, now),
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _evict_disk(self, now):
+        self._db.execute("DELETE FROM geocodes WHERE expires <= ?", (now,))
+        count = self._db.execute("SELECT COUNT(*) FROM geocodes").fetchone()[0]
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM geocodes WHERE key IN (SELECT key FROM geocodes ORDER BY last_used LIMIT ?)",
+                (count - self.max_disk_entries,),
+            )
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        lookups = hits + self.stats["misses"]
+        return hits / lookups if lookups else 0.0
@@ -0,0 +1,101 @@
+"""
+Shared Radar geocoding client.
+
+All forward-geocode requests go through one requests.Session per process,
+so connections to Radar are kept alive and pooled instead of being opened
+per answer. Each lookup has a deadline that covers every retry attempt.
+Lookups from concurrent requests share the pool.
+
+Set RADAR_BASE_URL to point the client at a local stub server (see
+trainning/geocode_stub_server.py).
+"""
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+RADAR_BASE_URL = "https://api.radar.io"
+FORWARD_PATH = "/v1/geocode/forward"
+DEFAULT_DEADLINE = 6
+# Longest single attempt, so a stalled connection still leaves time for a retry
+ATTEMPT_TIMEOUT = 3
+MAX_RETRIES = 2
+BACKOFF_BASE = 0.2
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_CONNECTIONS = 10
+
+
+class GeocodeError(Exception):
+    pass
+
+
+class Geocoder:
+    def __init__(self, api_key, base_url=None, deadline=DEFAULT_DEADLINE, max_retries=MAX_RETRIES):
+        self.api_key = api_key
+        self.url = (base_url or os.environ.get("RADAR_BASE_URL") or RADAR_BASE_URL).rstrip("/") + FORWARD_PATH
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONNECTIONS, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["Authorization"] = api_key
+        self.stats = {"calls": 0, "retries": 0, "failures": 0}
+        # Lookups come from several Flask threads
+        self._stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def forward(self, query, deadline=None):
+        """
+        Forward-geocodes `query`. Returns (status code, response JSON).
+        Raises GeocodeError if no response arrived within the deadline.
+        """
+        deadline = deadline or self.deadline
+        give_up = time.monotonic() + deadline
+        attempt = 0
+        while True:
+            remaining = give_up - time.monotonic()
+            if remaining <= 0:
+                self._count("failures")
+                raise GeocodeError(f"No response from Radar within {deadline}s")
+
+            self._count("calls")
+            error = None
+            try:
+                response = self.session.get(
+                    self.url,
+                    params={"query": query, "limit": 1},
+                    timeout=min(remaining, ATTEMPT_TIMEOUT),
+                )
+                if response.status_code not in RETRY_STATUS:
+                    return response.status_code, response.json()
+                error = GeocodeError(f"Radar returned {response.status_code}")
+            except (requests.exceptions.Timeout, requests.exceptions.ConnectionError) as e:
+                error = GeocodeError(f"Radar request failed: {e}")
+
+            backoff = random.uniform(0, BACKOFF_BASE * 2 ** attempt)
+            if attempt >= self.max_retries or time.monotonic() + backoff >= give_up:
+                self._count("failures")
+                raise error
+            attempt += 1
+            self._count("retries")
+            time.sleep(backoff)
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder(api_key):
+    """The process-wide Geocoder."""
+    global _geocoder
+    with _geocoder_lock:
+        if _geocoder is None:
+            _geocoder = Geocoder(api_key)
+        return _geocoder
@@ -1,21 +1,27 @@
-import requests
-import threading
 import datetime
 from phonenumbers import NumberParseException, is_valid_number, parse
-from spellchecker import SpellChecker
+
+from geocode_cache import GeocodeCache, MISS
+from geocoder import get_geocoder
+from gazetteer import load_gazetteer
+from spelling import SpellingEngine, load_lexicon, should_check
 
 api_key = "prj_test_sk_b3c2e2f2baeaecbad71675ce2d3bf43ff9d9f038"
+NOT_FOUND_MESSAGE = "No address found for your input. Please double-check and enter a valid address."
+
+# Country and city answers repeat across applicants, Radar is only asked once per address
+geocode_cache = GeocodeCache()
+# Countries and major cities are normalized locally, Radar is only needed for the rest
+gazetteer = load_gazetteer()
+# Pooled connections to Radar with a deadline per lookup
+geocoder = get_geocoder(api_key)
 
 
-spell = SpellChecker()
-def suggest_typo_correction(text: str):
-    words = text.split()
-    corrections = []
-    for word in words:
-        corrected = spell.correction(word)
-        if corrected and corrected != word:
-            corrections.append((word, corrected))
-    return corrections
+spelling = SpellingEngine(load_lexicon())
+def suggest_typo_correction(text: str, field: str = "", kind: str = "text"):
+    if not should_check(field, kind):
+        return []
+    return spelling.suggestions(text)
 
 
 def is_valid_date(date_str, formats=None, no_future_allowed=False, no_past_allowed=False):
@@ -46,54 +52,39 @@ def is_valid_date(date_str, formats=None, no_future_allowed=False, no_past_allow
     return False, "Please enter a valid date in YYYY-MM-DD format."
 
 
-def is_valid_location(address):
-    """
-    Validates an address using the Radar API.
-    Returns (True, address_dict) if valid, else (False, error_message).
-    """
-    if not address.strip():
-        return False, "Address input is empty."
-
-    url = "https://api.radar.io/v1/geocode/forward"
-    headers = {
-        "Authorization": api_key
-    }
-    params = {
-        "query": address,
-        "limit": 1
-    }
-
-    def make_request():
-        return requests.get(url, headers=headers, params=params, timeout=10)
-
+def _geocode(address):
     try:
-        warning_timer = threading.Timer(5, lambda: print("Waiting for Radar API response..."))
-        warning_timer.start()
-
-        try:
-            response = make_request()
-        except requests.exceptions.Timeout:
-            print("First attempt timed out after 10 seconds. Retrying...")
-            response = make_request()
-
-        finally:
-            warning_timer.cancel()
-
-        data = response.json()
+        status_code, data = geocoder.forward(address)
 
-        if response.status_code != 200:
+        if status_code != 200:
             return False, f"Radar API error: {data.get('message', 'Unknown error')}"
 
         results = data.get("addresses", [])
+        geocode_cache.put(address, results[0] if results else None)
         if results:
             return True, results[0]
         else:
-            return False, "No address found for your input. Please double-check and enter a valid address."
+            return False, NOT_FOUND_MESSAGE
 
     except Exception as e:
         return False, f"Error connecting to Radar API: {str(e)}"
 
 
+def is_valid_location(address):
+    """
+    Validates an address using the Radar API.
+    Returns (True, address_dict) if valid, else (False, error_message).
+    """
+    if not address.strip():
+        return False, "Address input is empty."
+
+    cached = geocode_cache.get(address)
+    if cached is not MISS:
+        return (True, cached) if cached is not None else (False, NOT_FOUND_MESSAGE)
+    # forward() enforces the deadline
+    return _geocode(address)
+
+
 def get_normalized_address(user_input, field_name):
     """
     Validates and normalizes a user input address using the Radar API.
@@ -112,24 +103,31 @@ def get_normalized_address(user_input, field_name):
             else:
                 print("Please answer 'yes' or 'no'.")
 
-    # Try initial validation
-    is_valid, result = is_valid_location(user_input)
-    if not is_valid:
-        print(f"❌ {result}")
-        return None
-
-    address_obj = result
     # Determine expected component based on field suffix
     if field_name.endswith("_city"):
         component = "city"
+        place = gazetteer.city(user_input)
     elif field_name.endswith("_country"):
         component = "country"
+        place = gazetteer.country(user_input)
     elif field_name.endswith("_state"):
         component = "state"
+        place = None
     else:
         component = "formattedAddress"
+        place = None
+
+    if place:
+        suggested_value = place["name"]
+    else:
+        # Try initial validation
+        is_valid, result = is_valid_location(user_input)
+        if not is_valid:
+            print(f"❌ {result}")
+            return None
 
-    suggested_value = address_obj.get(component, user_input)
+        address_obj = result
+        suggested_value = address_obj.get(component, user_input)
 
     if suggested_value.strip().lower() != user_input.strip().lower():
         confirmed = confirm_with_user(user_input, suggested_value, field_name.replace('_', ' '))
@@ -0,0 +1,92 @@
+"""
+Keeps state["messages"] bounded.
+
+The history sent to validate_with_llm and call_llm only needs the system
+prompt and the turns about the question being answered. Turns about earlier
+questions are folded into one rolling summary message (questions and the
+user's replies, no LLM involved), and the whole history is kept within a
+token budget. The oldest part of the summary is dropped first.
+"""
+MAX_HISTORY_TOKENS = 2000
+WINDOW_MESSAGES = 8
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+SUMMARY_MAX_TOKENS = 400
+MAX_LINE_CHARS = 160
+
+
+def estimate_tokens(text):
+    # About four characters per token for English text
+    return len(text) // 4 + 1
+
+
+def _tokens(messages):
+    return sum(estimate_tokens(msg["content"]) for msg in messages)
+
+
+def _shorten(text):
+    text = " ".join(text.split())
+    return text if len(text) <= MAX_LINE_CHARS else text[:MAX_LINE_CHARS - 3] + "..."
+
+
+def _summarize(summary, dropped):
+    """Appends one line per user reply in `dropped` to the rolling summary."""
+    lines = summary.splitlines() if summary else []
+    question = None
+    for msg in dropped:
+        if msg["role"] == "system":
+            question = msg["content"]
+        elif msg["role"] == "user":
+            lines.append(_shorten(f"Q: {question} | User: {msg['content']}" if question else f"User: {msg['content']}"))
+        elif msg["role"] == "assistant" and lines:
+            lines[-1] = _shorten(f"{lines[-1]} | Recorded: {msg['content']}")
+
+    # Oldest lines go first once the summary outgrows its budget
+    while lines and estimate_tokens("\n".join(lines)) > SUMMARY_MAX_TOKENS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def compact_history(messages, question_text, max_tokens=MAX_HISTORY_TOKENS, window=WINDOW_MESSAGES):
+    """
+    Returns the bounded history:
+        [system prompt, rolling summary, last `window` messages about the current question]
+
+    Args:
+        messages: the full history, messages[0] is the system prompt
+        question_text: text of the question being answered
+    """
+    if len(messages) < 2:
+        return list(messages)
+
+    system, rest = messages[0], messages[1:]
+    summary = ""
+    if rest[0]["role"] == "system" and rest[0]["content"].startswith(SUMMARY_PREFIX):
+        summary, rest = rest[0]["content"][len(SUMMARY_PREFIX):], rest[1:]
+
+    # The current question's turns start where it was first asked since the
+    # previous question, it is asked again before every follow-up
+    start = None
+    for i in range(len(rest) - 1, -1, -1):
+        if rest[i]["role"] == "system":
+            if rest[i]["content"] != question_text:
+                break
+            start = i
+    start = start or 0
+
+    current = rest[start:]
+    if len(current) > window:
+        # Keep the question itself at the front of the window
+        current = current[:1] + current[-(window - 1):] if current[0]["content"] == question_text else current[-window:]
+    kept = set(map(id, current))
+    summary = _summarize(summary, [msg for msg in rest if id(msg) not in kept])
+
+    # Over budget: drop summary lines, then the oldest current turns
+    while summary and _tokens([system] + current) + estimate_tokens(summary) > max_tokens:
+        summary = "\n".join(summary.splitlines()[1:])
+    while len(current) > 2 and _tokens([system] + current) > max_tokens:
+        current = current[1:]
+
+    history = [system]
+    if summary:
+        history.append({"role": "system", "content": SUMMARY_PREFIX + summary})
+    return history + current
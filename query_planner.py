@@ -0,0 +1,102 @@
+"""
+Local search-query planner for call_llm.
+
+call_llm normally asks the LLM (internet_search tool) to write search queries
+before retrieval. For most clarifying questions the queries can be built from
+the words of the question itself, the form question being answered and its
+field name, which saves a full LLM round trip. The planner reports a
+confidence, and call_llm only skips the LLM when it is high enough.
+"""
+import re
+
+CONFIDENCE_THRESHOLD = 0.6
+
+STOPWORDS = {
+    "a", "about", "am", "an", "and", "any", "are", "as", "at", "be", "by", "can", "could", "do", "does",
+    "did", "for", "from", "has", "have", "how", "i", "if", "in", "is", "it", "its", "me", "mean", "means",
+    "meant", "my", "need", "of", "on", "or", "please", "should", "so", "that", "the", "their", "there",
+    "this", "to", "what", "whats", "when", "where", "which", "who", "why", "will", "with", "would",
+    "you", "your", "yours", "we", "our", "they", "them", "he", "she", "his", "her", "was", "were",
+    "im", "ive", "dont", "know", "tell", "explain", "exactly", "here", "put", "write", "enter", "answer",
+}
+
+# Words that refer back to the conversation, the LLM resolves these better
+REFERENCE_WORDS = {"it", "this", "that", "these", "those", "one", "above", "previous", "earlier", "same"}
+
+# Form numbers and acronyms are decisive search terms on their own
+FORM_NUMBER = re.compile(r"\b(imm|cit|irm)\s?-?\s?(\d{4})\b", re.IGNORECASE)
+ACRONYM = re.compile(r"\b[A-Z]{2,6}\b")
+WORD = re.compile(r"[a-z][a-z'\-]+")
+
+DOMAIN_TERMS = {
+    "dli", "caq", "uci", "lmia", "pgwp", "gic", "biometrics", "permit", "visa", "passport",
+    "common-law", "citizenship", "residence", "resident", "refugee", "sponsor", "attestation",
+    "tuition", "funds", "study", "work", "spouse", "dependant", "dependent", "custodian", "eta",
+    "married", "marital", "divorced", "separated", "widowed", "nominee", "province", "provincial",
+}
+
+
+def extract_keywords(text):
+    """Content words in order of appearance, without duplicates."""
+    keywords = []
+    for word in WORD.findall(text.lower()):
+        word = word.strip("'-").replace("'", "")
+        if word and word not in STOPWORDS and word not in keywords:
+            keywords.append(word)
+    return keywords
+
+
+def field_terms(field):
+    """'school_dli#' -> ['school', 'dli'], drops numbering like '_2'."""
+    return [part for part in re.split(r"[_#\s]+", field.lower()) if part and not part.isdigit()]
+
+
+def _unique(terms):
+    # Case-insensitive, also drops 'imm' once 'IMM 5645' is a term
+    seen, result = set(), []
+    for term in terms:
+        parts = term.lower().split()
+        if term.lower() not in seen and not (len(parts) == 1 and parts[0] in seen):
+            result.append(term)
+            seen.add(term.lower())
+            seen.update(parts)
+    return result
+
+
+def plan_queries(user_question, question_text, field):
+    """
+    Returns:
+        queries: list of search queries, most specific first
+        confidence: 0..1, how likely the queries are as good as the LLM's
+    """
+    forms = [f"{prefix.upper()} {number}" for prefix, number in FORM_NUMBER.findall(user_question)]
+    acronyms = [a for a in ACRONYM.findall(user_question) if a not in ("I", "OK")]
+    keywords = extract_keywords(user_question)
+    context = [word for word in _unique(extract_keywords(question_text) + field_terms(field)) if word not in keywords]
+
+    queries = []
+    specific = _unique(forms + acronyms + keywords)
+    if specific:
+        queries.append(" ".join(specific))
+        if context:
+            queries.append(" ".join(_unique(specific + context[:4])))
+    elif context:
+        queries.append(" ".join(context))
+
+    # Score how self-contained the question is
+    words = WORD.findall(user_question.lower())
+    references = sum(1 for word in words if word in REFERENCE_WORDS)
+    domain_hits = sum(1 for word in keywords if word in DOMAIN_TERMS)
+
+    confidence = 0.0
+    if forms or acronyms:
+        confidence += 0.5
+    confidence += min(0.4, 0.15 * len(keywords))
+    confidence += min(0.3, 0.15 * domain_hits)
+    if keywords and references and len(keywords) <= references:
+        confidence -= 0.3
+    # Long, multi-part questions are better decomposed by the LLM
+    if len(words) > 25 or user_question.count("?") > 1:
+        confidence -= 0.3
+
+    return queries, max(0.0, min(1.0, confidence))
@@ -1,83 +1,132 @@
-# Handle skipping questions
-def skipped_questions(field, answers):
-    field_value = answers.get(field, '').lower()
-
-    if field == 'other_names' and field_value == 'no':
-        return 2
-    if field == 'resided_other_countries' and field_value == 'no':
-        return 9
-    if field == 'resided_other_countries_2' and field_value == 'no':
-        return 4
-    if field == 'country_applying_from_same' and field_value == 'no':
-        return 4
-    if field == 'marital_status' and field_value not in ['married', 'common-law']:
-        return 15
-    if field == 'partner_email' and answers.get('marital_status', '').lower() == 'married':
-        return 7
-    if field == 'previous_relationship' and field_value == 'no':
-        return 6
-    if field == 'uci_issued' and field_value == 'no':
-        return 1
-    if field == 'nin_document' and field_value == 'no':
-        return 4
-    if field == 'us_permanent_resident' and field_value == 'no':
-        return 2
-    if field == 'mailing_address_same' and field_value == 'yes':
-        return 1
-    if field == 'has_alternate_phone' and field_value == 'no':
-        return 5
-    if field == 'has_fax_number' and field_value == 'no':
-        return 4
-    if field == 'has_provincial_attestation' and field_value == 'no':
-        return 2
-    if field == 'has_caq' and field_value == 'no':
-        return 2
-    if field == 'has_post_secondary_education' and field_value == 'no':
-        return 8
-    if field == 'employment_other' and field_value == 'no':
-        return 17
-    if field == 'employment_other_2' and field_value == 'no':
-        return 8
-    if field == 'physical_or_mental_disorder' and field_value == 'no' and answers.get('tuberculosis_exposure',
-                                                                                      '').lower() == 'no':
-        return 1
-    if field == 'previous_application_canada' and field_value == 'no' and answers.get('visa_or_entry_refused',
-                                                                                      '').lower() == 'no' and answers.get(
-            'status_violation_canada', '').lower() == 'no':
-        return 1
-    if field == 'criminal_history' and field_value == 'no':
-        return 1
-    if field == 'military_or_security_service' and field_value == 'no':
-        return 5
-    if field == 'has_children' and field_value == 'no':
-        return 27
-    if field == 'has_children_2' and field_value == 'no':
-        return 17
-    if field == 'has_children_3' and field_value == 'no':
-        return 8
-    if field == 'has_siblings' and field_value == 'no':
-        return 9
-    if field == 'has_siblings_2' and field_value == 'no':
-        return 9
-    if field == 'has_siblings_3' and field_value == 'no':
-        return 9
-    if field == 'minor_status' and field_value == 'no':
-        return 6
-    if field == 'uci_issued' and field_value == 'no':
-        return 1
-
-    # No skip needed for 'check_eligibility' here, as that breaks the loop
-
-    # if q26 answer = yes then q26=q11, q27=q12, q28=q13, q29=q14
-    if field == 'country_applying_from_same' and field_value == 'yes':
-        # autofill answers for related fields
-        answers['country_applying_from'] = answers.get('residence_country', '')
-        answers['status_country_applying_from'] = answers.get('residence_status', '')
-        answers['current_country_start_date'] = answers.get('residence_status_start_date', '')
-        answers['current_country_end_date'] = answers.get('residence_status_end_date', '')
-        return 4
-    if field == 'mailing_address_same' and field_value == 'yes':
-        answers['residential_address'] = answers.get('mailing_address', '')
-        return 1
-    return 0
+"""
+Skip rules between questions.
 
+The rules live in trainning/skip_rules.json. Each rule names the question it
+applies to, the answers that trigger it, an optional autofill (answer fields
+copied from earlier answers) and the field of the question to jump to:
+
+    {"field": "has_caq", "when": {"has_caq": {"equals": "no"}}, "goto": "has_post_secondary_education"}
+
+Conditions use "equals" or "not_in" and are compared case-insensitively. A
+field that is asked more than once needs "occurrence" (1 for its first
+appearance in the question file). "goto": "END" finishes the form.
+
+At load time the rules are checked against the question table and compiled
+into a map from question position to its rules with absolute jump targets.
+"""
+import json
+
+SKIP_RULES_PATH = 'trainning/skip_rules.json'
+END = "END"
+OPERATORS = ("equals", "not_in")
+
+
+class SkipRuleError(ValueError):
+    pass
+
+
+class SkipRules:
+    def __init__(self, dispatch):
+        # position -> [(conditions, target index, autofill), ...] in rule order
+        self._dispatch = dispatch
+
+    @staticmethod
+    def _matches(conditions, answers):
+        for field, operator, values in conditions:
+            value = str(answers.get(field, '')).lower()
+            if operator == "equals" and value not in values:
+                return False
+            if operator == "not_in" and value in values:
+                return False
+        return True
+
+    def match(self, position, answers):
+        """The first rule of this question that applies, as (target index, autofill), or None."""
+        for conditions, target, autofill in self._dispatch.get(position, ()):
+            if self._matches(conditions, answers):
+                return target, autofill
+        return None
+
+    def next_index(self, position, answers):
+        """
+        Index of the question to ask after the one at `position` was answered.
+        Autofilled answers are written into `answers`.
+        """
+        matched = self.match(position, answers)
+        if matched is None:
+            return position + 1
+        target, autofill = matched
+        for field, source in autofill:
+            answers[field] = answers.get(source, '')
+        return target
+
+    def rules_for(self, position):
+        return self._dispatch.get(position, ())
+
+
+def compile_skip_rules(rules, questions):
+    """
+    Validates the rules against the question table and resolves field names
+    to positions. Raises SkipRuleError on the first problem found.
+    """
+    positions = {}
+    for q in questions:
+        positions.setdefault(q.field, []).append(q.position)
+
+    def first_position(field, rule_no):
+        if field not in positions:
+            raise SkipRuleError(f"Rule {rule_no}: unknown field '{field}'")
+        return positions[field][0]
+
+    dispatch = {}
+    for rule_no, rule in enumerate(rules, start=1):
+        field = rule.get("field")
+        if field not in positions:
+            raise SkipRuleError(f"Rule {rule_no}: unknown field '{field}'")
+        occurrences = positions[field]
+        if len(occurrences) > 1 and "occurrence" not in rule:
+            raise SkipRuleError(f"Rule {rule_no}: '{field}' is asked {len(occurrences)} times, set 'occurrence'")
+        occurrence = rule.get("occurrence", 1)
+        if not 1 <= occurrence <= len(occurrences):
+            raise SkipRuleError(f"Rule {rule_no}: '{field}' has no occurrence {occurrence}")
+        source = occurrences[occurrence - 1]
+
+        # Jump target: the first time the goto field is asked after this question
+        goto = rule.get("goto")
+        if goto == END:
+            target = len(questions)
+        else:
+            first_position(goto, rule_no)
+            later = [p for p in positions[goto] if p > source]
+            if not later:
+                raise SkipRuleError(f"Rule {rule_no}: '{goto}' is not asked after '{field}', rules can only skip forward")
+            target = later[0]
+
+        conditions = []
+        for cond_field, spec in (rule.get("when") or {}).items():
+            if first_position(cond_field, rule_no) > source:
+                raise SkipRuleError(f"Rule {rule_no}: condition on '{cond_field}', which is asked after '{field}'")
+            if len(spec) != 1 or next(iter(spec)) not in OPERATORS:
+                raise SkipRuleError(f"Rule {rule_no}: condition on '{cond_field}' must use one of {OPERATORS}")
+            operator, values = next(iter(spec.items()))
+            values = [values] if isinstance(values, str) else values
+            conditions.append((cond_field, operator, frozenset(v.lower() for v in values)))
+        if not conditions:
+            raise SkipRuleError(f"Rule {rule_no}: no conditions")
+
+        autofill = []
+        for fill_field, source_field in (rule.get("autofill") or {}).items():
+            first_position(source_field, rule_no)
+            if not any(source < p < target for p in positions.get(fill_field, [])):
+                raise SkipRuleError(f"Rule {rule_no}: autofilled '{fill_field}' is not among the skipped questions")
+            autofill.append((fill_field, source_field))
+
+        dispatch.setdefault(source, []).append((tuple(conditions), target, tuple(autofill)))
+
+    return SkipRules(dispatch)
+
+
+def load_skip_rules(questions, path=SKIP_RULES_PATH):
+    with open(path, 'r', encoding='utf-8') as f:
+        rules = json.load(f)["rules"]
+    return compile_skip_rules(rules, questions)
@@ -0,0 +1,105 @@
+"""
+Compiled question table.
+
+questions_file_updated.json is parsed once at startup into an immutable tuple
+of CompiledQuestion records. Everything chat_step used to work out from the
+question text and field name on every turn (answer options, which validator
+applies, date constraints) is computed here once. The compiled table is
+cached next to the source file and rebuilt when the source changes.
+"""
+import json
+import os
+import pickle
+import re
+from typing import NamedTuple
+
+from answer_classifier import parse_options
+
+COMPILED_SUFFIX = ".compiled.pickle"
+# Bump when CompiledQuestion or the compile rules change
+TABLE_VERSION = 1
+
+ADDRESS_SUFFIXES = ("_address", "_city", "_country", "_postal_code")
+PHONE_SUFFIXES = ("_phone_country_code", "_phone_number", "_phone_extension", "_full_phone_number")
+NO_FUTURE_DATE_FIELDS = ("date_of_birth", "date of birth", "passport_issue_date")
+
+
+class CompiledQuestion(NamedTuple):
+    position: int
+    field: str
+    text: str
+    # Accepted answers, empty if the answer is free-form
+    options: tuple
+    options_lower: frozenset
+    # Which validation chat_step applies: "date", "address", "phone", "option" or "text"
+    kind: str
+    # Field without its repeat number, e.g. "has_children" for "has_children_2"
+    family: str
+    no_future_allowed: bool
+    no_past_allowed: bool
+    # Location/date/phone questions are answered through handle_loc_date_phone_question
+    asks_loc_date_phone: bool
+
+
+def compile_question(position, raw):
+    field, text = raw["field"], raw["text"]
+    is_date = "date" in field.lower()
+    options = () if is_date else tuple(parse_options(text))
+
+    if is_date:
+        kind = "date"
+    elif field.endswith(ADDRESS_SUFFIXES):
+        kind = "address"
+    elif field.endswith(PHONE_SUFFIXES):
+        kind = "phone"
+    elif options:
+        kind = "option"
+    else:
+        kind = "text"
+
+    return CompiledQuestion(
+        position=position,
+        field=field,
+        text=text,
+        options=options,
+        options_lower=frozenset(opt.lower() for opt in options),
+        kind=kind,
+        family=re.sub(r"_\d+$", "", field),
+        no_future_allowed=field in NO_FUTURE_DATE_FIELDS,
+        no_past_allowed="expiry" in field.lower(),
+        asks_loc_date_phone="location" in field or "date" in field or "phone" in field,
+    )
+
+
+def _source_signature(path):
+    stat = os.stat(path)
+    return TABLE_VERSION, stat.st_size, stat.st_mtime_ns
+
+
+def load_question_table(path):
+    """
+    Returns the compiled questions as a tuple indexed by question_index.
+    Uses the cached compiled form if it matches the source file.
+    """
+    compiled_path = path + COMPILED_SUFFIX
+    signature = _source_signature(path)
+    try:
+        with open(compiled_path, "rb") as f:
+            cached_signature, table = pickle.load(f)
+        if cached_signature == signature:
+            return table
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        pass
+
+    with open(path, "r", encoding="utf-8") as f:
+        raw_questions = json.load(f)
+    table = tuple(compile_question(i, raw) for i, raw in enumerate(raw_questions))
+
+    tmp_path = compiled_path + ".tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            pickle.dump((signature, table), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, compiled_path)
+    except OSError as e:
+        print(f"⚠️ Could not cache the compiled question table: {e}")
+    return table
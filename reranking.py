@@ -0,0 +1,56 @@
+"""
+Adaptive reranking for the documents retrieved by call_llm.
+
+Three paths pick the documents sent to the final chat call:
+  - "margin": the dense scores already separate the winners from the rest by
+              at least RERANK_MARGIN, so the remote reranker is skipped.
+  - "remote": co.rerank, as before, with a deadline.
+  - "local":  BM25 over the few candidates, used when the remote reranker
+              fails or times out.
+"""
+import threading
+
+from bm25_index import BM25Index
+
+RERANK_MARGIN = 0.05
+RERANK_TIMEOUT = 3
+
+
+def is_decisive(scores, top_n, margin=RERANK_MARGIN):
+    """True if the top_n best scores beat the next one by at least margin."""
+    if len(scores) <= top_n:
+        return True
+    ranked = sorted(scores, reverse=True)
+    return ranked[top_n - 1] - ranked[top_n] >= margin
+
+
+def local_rerank(question, texts, top_n):
+    """Indexes of the top_n texts by BM25 against the question."""
+    scores = BM25Index.build(texts).scores(question)
+    order = sorted(range(len(texts)), key=lambda i: -scores[i])
+    return order[:top_n]
+
+
+class RerankStats:
+    """How often each path was taken and how much remote latency was avoided."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts = {"margin": 0, "remote": 0, "local": 0}
+        self.seconds = {"margin": 0.0, "remote": 0.0, "local": 0.0}
+
+    def record(self, path, seconds):
+        with self._lock:
+            self.counts[path] += 1
+            self.seconds[path] += seconds
+
+    def summary(self):
+        with self._lock:
+            remote_avg = self.seconds["remote"] / self.counts["remote"] if self.counts["remote"] else 0.0
+            return {
+                "counts": dict(self.counts),
+                "avg_remote_seconds": remote_avg,
+                # Margin skips at the average remote latency. The local path
+                # runs after a failed remote call, so it saves nothing.
+                "estimated_seconds_saved": self.counts["margin"] * remote_avg - self.seconds["margin"],
+            }
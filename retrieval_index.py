@@ -0,0 +1,178 @@
+"""
+Retrieval indexes over the document embeddings used by call_llm.
+
+Two index kinds are available:
+  - "flat": exact inner-product search over every document (the baseline).
+  - "ivf":  inverted-file index. Documents are clustered with k-means and a
+            query only scores the documents in its `nprobe` closest clusters.
+
+Indexes are built offline (see trainning/build_index.py) and saved next to the
+embeddings. The index file only stores the index structure, the embeddings
+themselves are always read from the embedding file.
+"""
+import os
+import numpy as np
+
+INDEX_PATH = "others/doc_index.npz"
+
+
+def top_k(scores, k):
+    """
+    Returns the indices of the k largest scores, best first.
+    Uses a partial selection so only the k winners get sorted.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1)[:k]
+    return idx[np.argsort(-scores[idx], kind="stable")]
+
+
+def top_k_rows(scores, k):
+    """Row-wise top_k over a (queries x documents) score matrix."""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, idx, axis=1), axis=1, kind="stable")
+    return np.take_along_axis(idx, order, axis=1)
+
+
+def reciprocal_rank_fusion(ranked_lists, k=60):
+    """
+    Merges several rankings of document ids into one. Each document scores
+    sum(1 / (k + rank)) over the lists it appears in.
+
+    Returns:
+        document ids, best first
+    """
+    fused = {}
+    for ranking in ranked_lists:
+        for rank, doc_id in enumerate(ranking):
+            doc_id = int(doc_id)
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused, key=lambda doc_id: -fused[doc_id])
+
+
+def _as_queries(query_emb):
+    return np.atleast_2d(np.asarray(query_emb, dtype=np.float32))
+
+
+class FlatIndex:
+    """Exact search: scores every document."""
+    kind = "flat"
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    def search(self, query_emb, k):
+        """
+        Args:
+            query_emb: one query vector or a matrix with one query per row
+            k: number of documents to return per query
+
+        Returns:
+            ids, scores: one row per query, best match first
+        """
+        # All queries are scored in a single matrix product
+        all_scores = np.dot(_as_queries(query_emb), np.transpose(self.embeddings))
+        ids = top_k_rows(all_scores, k)
+        return ids, np.take_along_axis(all_scores, ids, axis=1)
+
+    def save(self, path=INDEX_PATH):
+        np.savez(path, kind=np.array(self.kind), n_docs=np.array(len(self)))
+
+
+class IVFIndex:
+    """Approximate search: only scores documents in the closest clusters."""
+    kind = "ivf"
+
+    def __init__(self, embeddings, centroids, list_offsets, list_ids, nprobe=8):
+        self.embeddings = embeddings
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_ids = list_ids
+        self.nprobe = nprobe
+
+    def __len__(self):
+        return self.embeddings.shape[0]
+
+    @classmethod
+    def build(cls, embeddings, nlist=None, n_iter=20, nprobe=8, seed=0):
+        """Clusters the embeddings with spherical k-means."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        n_docs = vectors.shape[0]
+        if nlist is None:
+            nlist = max(1, int(np.sqrt(n_docs)))
+        nlist = min(nlist, n_docs)
+
+        rng = np.random.default_rng(seed)
+        centroids = vectors[rng.choice(n_docs, nlist, replace=False)].copy()
+        for _ in range(n_iter):
+            assign = np.argmax(vectors @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = vectors[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+            centroids /= np.where(norms == 0, 1, norms)
+
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        list_ids = np.argsort(assign, kind="stable").astype(np.int64)
+        counts = np.bincount(assign, minlength=nlist)
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(embeddings, centroids, list_offsets, list_ids, nprobe=nprobe)
+
+    def search(self, query_emb, k):
+        """
+        Same contract as FlatIndex.search. The clusters probed by all queries
+        are pooled and scored against every query in one matrix product.
+        """
+        queries = _as_queries(query_emb)
+        probe = np.unique(top_k_rows(queries @ self.centroids.T, self.nprobe))
+        candidates = np.concatenate(
+            [self.list_ids[self.list_offsets[c]:self.list_offsets[c + 1]] for c in probe]
+        )
+        cand_scores = np.dot(queries, np.transpose(self.embeddings[candidates]))
+        best = top_k_rows(cand_scores, k)
+        return candidates[best], np.take_along_axis(cand_scores, best, axis=1)
+
+    def save(self, path=INDEX_PATH):
+        np.savez(
+            path,
+            kind=np.array(self.kind),
+            n_docs=np.array(len(self)),
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            list_ids=self.list_ids,
+            nprobe=np.array(self.nprobe),
+        )
+
+
+def load_index(embeddings, path=INDEX_PATH):
+    """
+    Loads the index built offline for these embeddings.
+    Falls back to exact search if no index was built or it is stale.
+    """
+    if not os.path.exists(path):
+        return FlatIndex(embeddings)
+
+    saved = np.load(path)
+    if int(saved["n_docs"]) != embeddings.shape[0]:
+        print(f"⚠️ {path} was built for {int(saved['n_docs'])} documents, "
+              f"found {embeddings.shape[0]}. Using exact search, rebuild the index.")
+        return FlatIndex(embeddings)
+
+    kind = str(saved["kind"])
+    if kind == IVFIndex.kind:
+        return IVFIndex(
+            embeddings,
+            saved["centroids"],
+            saved["list_offsets"],
+            saved["list_ids"],
+            nprobe=int(saved["nprobe"]),
+        )
+    return FlatIndex(embeddings)
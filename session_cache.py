@@ -0,0 +1,249 @@
+"""
+Write-behind cache of hot conversation states.
+
+SessionCache sits in front of a StateStore with the same interface. Loads of
+cached conversations don't touch the store, and saves only update the
+cached state; a background thread writes changed states to the store every
+`flush_interval` seconds, and close() (registered with atexit) writes the
+rest at shutdown. An entry is written before it is evicted.
+
+How much can be lost is set by the fsync policy:
+  - "always": no write-behind, every save is written and fsynced before it returns.
+  - "flush" (default): saves are written every flush_interval and each flush
+    is fsynced. A crash loses at most the last interval.
+  - "off": like "flush" but the OS decides when data reaches the disk.
+
+Cached and stored states share one version space: a flush stores the state
+under the version the cache handed out for it, so a version from the cache
+can always be checked by the store once the entry is gone.
+
+The cache assumes one process serves each conversation. Run several
+workers with sticky routing, or set SESSION_CACHE_SIZE=0.
+"""
+import atexit
+import threading
+import time
+from collections import OrderedDict
+
+from state_store import StateStore, VersionConflict, copy_state, next_version
+
+SESSION_CACHE_SIZE = 1000
+FLUSH_INTERVAL = 2.0
+FSYNC_POLICIES = ("always", "flush", "off")
+
+
+class _Entry:
+    __slots__ = ("state", "version", "stored_version", "dirty_since")
+
+    def __init__(self, state, version):
+        self.state = state
+        # Version handed to callers, goes up on every save
+        self.version = version
+        # Version of the store's copy, catches up with `version` on every flush
+        self.stored_version = version
+        # When the entry first changed after its last flush, None if clean
+        self.dirty_since = None
+
+
+class SessionCache(StateStore):
+    def __init__(self, store, max_entries=SESSION_CACHE_SIZE, flush_interval=FLUSH_INTERVAL, fsync="flush"):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', use one of {FSYNC_POLICIES}")
+        self.store = store
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.write_through = fsync == "always"
+        self._entries = OrderedDict()
+        # Entries pushed out of the LRU that may not be written yet
+        self._evicting = {}
+        self._lock = threading.Lock()
+        # One flush at a time, so the flusher and evictions don't write the same entry twice
+        self._flush_lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "flushes": 0, "flushed_states": 0,
+                      "conflicts": 0, "last_flush_seconds": 0.0}
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if not self.write_through:
+            self._flusher = threading.Thread(target=self._flush_loop, name="session-flush", daemon=True)
+            self._flusher.start()
+        atexit.register(self.close)
+
+    def _remember(self, conversation_id, entry):
+        """Adds an entry, returns the entries pushed out of the LRU."""
+        self._entries[conversation_id] = entry
+        self._entries.move_to_end(conversation_id)
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted_id, evicted_entry = self._entries.popitem(last=False)
+            self._evicting[evicted_id] = evicted_entry
+            evicted.append(evicted_id)
+            self.stats["evictions"] += 1
+        return evicted
+
+    def _write(self, conversation_id, entry, state, version):
+        """Writes `state` (the entry's state at `version`) to the store."""
+        try:
+            self.store.save(conversation_id, state, expected_version=entry.stored_version, new_version=version)
+        except VersionConflict as e:
+            # Another process wrote this conversation, its state wins
+            print(f"⚠️ Dropping cached state of {conversation_id}: {e}")
+            self.stats["conflicts"] += 1
+            with self._lock:
+                if self._entries.get(conversation_id) is entry:
+                    del self._entries[conversation_id]
+            return
+        with self._lock:
+            entry.stored_version = version
+            if entry.version == version:
+                entry.dirty_since = None
+
+    def _settle(self, conversation_id):
+        """Writes the conversation's evicted entry if it is still pending, so the store is up to date."""
+        with self._lock:
+            if conversation_id not in self._evicting:
+                return
+        with self._flush_lock:
+            with self._lock:
+                entry = self._evicting.pop(conversation_id, None)
+            if entry is not None and entry.dirty_since is not None:
+                try:
+                    self._write(conversation_id, entry, entry.state, entry.version)
+                except Exception:
+                    self._keep_evicted(conversation_id, entry)
+                    raise
+
+    def _keep_evicted(self, conversation_id, entry):
+        """Puts back an evicted entry whose write failed, so the next flush retries it."""
+        with self._lock:
+            if conversation_id not in self._entries:
+                self._evicting.setdefault(conversation_id, entry)
+
+    def _write_evicted(self, evicted):
+        for conversation_id in evicted:
+            self._settle(conversation_id)
+
+    def create(self, conversation_id, state):
+        version = self.store.create(conversation_id, state)
+        with self._lock:
+            evicted = self._remember(conversation_id, _Entry(copy_state(state), version))
+        self._write_evicted(evicted)
+        return version
+
+    def load(self, conversation_id):
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is not None:
+                self._entries.move_to_end(conversation_id)
+                self.stats["hits"] += 1
+                # Callers edit the state they get in place
+                return copy_state(entry.state), entry.version
+            self.stats["misses"] += 1
+
+        self._settle(conversation_id)
+        loaded = self.store.load(conversation_id)
+        if loaded is None:
+            return None
+        state, version = loaded
+        with self._lock:
+            # A concurrent load or save may have cached it meanwhile
+            entry = self._entries.get(conversation_id)
+            if entry is not None:
+                return copy_state(entry.state), entry.version
+            evicted = self._remember(conversation_id, _Entry(copy_state(state), version))
+        self._write_evicted(evicted)
+        return state, version
+
+    def save(self, conversation_id, state, expected_version=None, new_version=None):
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+        if entry is None:
+            # Not cached, e.g. evicted since it was loaded: write through and cache the result
+            self._settle(conversation_id)
+            version = self.store.save(conversation_id, state, expected_version=expected_version,
+                                      new_version=new_version)
+            with self._lock:
+                evicted = self._remember(conversation_id, _Entry(copy_state(state), version))
+            self._write_evicted(evicted)
+            return version
+
+        with self._lock:
+            if self._entries.get(conversation_id) is not entry:
+                # Evicted or dropped between the two lookups
+                return self.save(conversation_id, state, expected_version, new_version)
+            if expected_version is not None and entry.version != expected_version:
+                raise VersionConflict(
+                    f"Conversation {conversation_id} is at version {entry.version}, expected {expected_version}"
+                )
+            entry.version = next_version(entry.version, new_version)
+            entry.state = copy_state(state)
+            if entry.dirty_since is None:
+                entry.dirty_since = time.monotonic()
+            self._entries.move_to_end(conversation_id)
+            version = entry.version
+            state = entry.state
+
+        if self.write_through:
+            with self._flush_lock:
+                self._write(conversation_id, entry, state, version)
+        return version
+
+    def delete(self, conversation_id):
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+            self._evicting.pop(conversation_id, None)
+        with self._flush_lock:
+            return self.store.delete(conversation_id)
+
+    def conversation_ids(self):
+        self.flush()
+        return self.store.conversation_ids()
+
+    def flush(self):
+        """Writes every changed state to the store."""
+        with self._flush_lock:
+            start = time.monotonic()
+            with self._lock:
+                pending = list(self._entries.items()) + list(self._evicting.items())
+                self._evicting.clear()
+                dirty = [(cid, entry, entry.state, entry.version)
+                         for cid, entry in pending if entry.dirty_since is not None]
+            for conversation_id, entry, state, version in dirty:
+                try:
+                    self._write(conversation_id, entry, state, version)
+                except Exception as e:
+                    # Stays dirty, the next flush tries again
+                    print(f"⚠️ Could not write the state of {conversation_id}: {e}")
+                    self._keep_evicted(conversation_id, entry)
+            self.stats["flushes"] += 1
+            self.stats["flushed_states"] += len(dirty)
+            self.stats["last_flush_seconds"] = time.monotonic() - start
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        """Stops the flusher and writes everything still pending."""
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=self.flush_interval + 5)
+        self.flush()
+
+    def hit_ratio(self):
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def flush_lag(self):
+        """Seconds since the oldest unwritten change was made, 0 if everything is written."""
+        now = time.monotonic()
+        with self._lock:
+            pending = [entry.dirty_since for entry in self._entries.values() if entry.dirty_since is not None]
+        return now - min(pending) if pending else 0.0
+
+    def summary(self):
+        with self._lock:
+            size = len(self._entries)
+            dirty = sum(entry.dirty_since is not None for entry in self._entries.values())
+        return {**self.stats, "size": size, "max_entries": self.max_entries, "dirty": dirty,
+                "hit_ratio": self.hit_ratio(), "flush_lag_seconds": self.flush_lag()}
@@ -0,0 +1,68 @@
+"""
+Typo suggestions for free-form answers.
+
+Words are first checked against the dictionary in one batch, only the
+unknown ones go through the (slow) edit-distance search, and each search
+result is memoized. The dictionary is extended with a domain lexicon of
+countries, cities, Canadian institutions, the question options and the
+crawled corpus, built by trainning/build_lexicon.py. Fields that hold names,
+places or identifiers are never checked.
+"""
+import json
+import re
+from functools import lru_cache
+
+from spellchecker import SpellChecker
+
+LEXICON_PATH = "others/domain_lexicon.json"
+CACHE_SIZE = 50_000
+# Letters only, numbers and IDs are never typos
+WORD = re.compile(r"[A-Za-z]+(?:['’][A-Za-z]+)*")
+# Answers validated some other way
+SKIP_KINDS = {"date", "phone", "address", "option"}
+# Free-form fields holding names, places, numbers or identifiers
+SKIP_FIELDS = re.compile(
+    r"name|number|_num\b|_id\b|uci|uscis|caq|dli|email|code|extension|cost_|funds|"
+    r"country|city|province|address|destination|language|police"
+)
+
+
+def should_check(field, kind="text"):
+    """False for answers that are names, places, IDs or already validated."""
+    return kind not in SKIP_KINDS and not SKIP_FIELDS.search(field)
+
+
+def load_lexicon(path=LEXICON_PATH):
+    """{word: count} of the domain lexicon, empty if it hasn't been built."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        print(f"⚠️ {path} not found, spell-checking with the English dictionary only. "
+              f"Run python -m trainning.build_lexicon to build it.")
+        return {}
+
+
+class SpellingEngine:
+    def __init__(self, lexicon=None, cache_size=CACHE_SIZE):
+        self._spell = SpellChecker()
+        if lexicon:
+            self._spell.word_frequency.load_json(lexicon)
+        self.correction = lru_cache(maxsize=cache_size)(self._spell.correction)
+
+    def suggestions(self, text):
+        """[(word, correction), ...] for the words of `text` that look misspelled."""
+        # Acronyms like UCI or CAQ are left alone
+        words = [w for w in dict.fromkeys(WORD.findall(text)) if len(w) > 1 and not w.isupper()]
+        unknown = self._spell.unknown(words)
+        corrections = []
+        for word in words:
+            if word.lower() not in unknown:
+                continue
+            corrected = self.correction(word.lower())
+            if corrected and corrected != word.lower():
+                corrections.append((word, corrected))
+        return corrections
+
+    def cache_info(self):
+        return self.correction.cache_info()
@@ -0,0 +1,180 @@
+"""
+Compact binary encoding of conversation states.
+
+A state in JSON repeats the full system prompt and every question text in
+its messages, and the field names in its answers and attempt counters. The
+codec replaces them with references into a shared table (the prompts and
+question texts, and the question fields) and writes the result as msgpack,
+zstd-compressed if the zstandard package is installed.
+
+Encoded data starts with MAGIC, so readers can tell it from JSON. It also
+carries the fingerprint of the table it was encoded with. Every table is
+saved under its fingerprint when it first encodes a state, so states
+written before the questions changed can still be decoded.
+"""
+import hashlib
+import json
+import os
+import struct
+import threading
+
+import msgpack
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+MAGIC = b"IMST"
+FORMAT_VERSION = 1
+FLAG_ZSTD = 1
+# MAGIC, format version, flags, table fingerprint
+HEADER = struct.Struct(">4sBB8s")
+CODEC_TABLE_DIR = "conversations/codec_tables"
+# Smaller payloads don't get smaller with zstd
+COMPRESS_MIN_BYTES = 512
+ROLES = ("system", "user", "assistant")
+ROLE_IDS = {role: i for i, role in enumerate(ROLES)}
+# Keys of a state (or state delta) that are encoded positionally
+ANSWERS, MESSAGES, ATTEMPTS, REST = range(4)
+
+
+class StateCodecError(ValueError):
+    pass
+
+
+def is_encoded(data):
+    return isinstance(data, (bytes, bytearray, memoryview)) and bytes(data[:len(MAGIC)]) == MAGIC
+
+
+class _Table:
+    def __init__(self, texts, fields):
+        self.texts = list(texts)
+        self.fields = list(fields)
+        self.text_ids = {text: i for i, text in enumerate(self.texts)}
+        self.field_ids = {field: i for i, field in enumerate(self.fields)}
+        raw = json.dumps([self.texts, self.fields], ensure_ascii=False).encode("utf-8")
+        self.fingerprint = hashlib.sha1(raw).digest()[:8]
+
+
+class StateCodec:
+    def __init__(self, texts, fields, table_dir=CODEC_TABLE_DIR, compress=None):
+        """
+        Args:
+            texts: prompts and question texts that messages refer to
+            fields: question fields, answers are keyed by their position here
+            table_dir: where tables are kept for decoding older states
+            compress: zstd-compress payloads, default if zstandard is installed
+        """
+        self.table = _Table(texts, list(dict.fromkeys(fields)))
+        self.table_dir = table_dir
+        if compress and zstandard is None:
+            raise StateCodecError("zstd compression needs the zstandard package")
+        self.compress = zstandard is not None if compress is None else compress
+        self._tables = {self.table.fingerprint: self.table}
+        self._lock = threading.Lock()
+        # Written on the first encode, building a codec touches no files
+        self._table_saved = False
+
+    def _table_path(self, fingerprint):
+        return os.path.join(self.table_dir, f"{fingerprint.hex()}.json")
+
+    def _save_table(self, table):
+        if not self.table_dir:
+            return
+        path = self._table_path(table.fingerprint)
+        if os.path.exists(path):
+            return
+        os.makedirs(self.table_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"texts": table.texts, "fields": table.fields}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def _get_table(self, fingerprint):
+        with self._lock:
+            table = self._tables.get(fingerprint)
+            if table is None:
+                try:
+                    with open(self._table_path(fingerprint), "r", encoding="utf-8") as f:
+                        raw = json.load(f)
+                except (OSError, TypeError) as e:
+                    raise StateCodecError(f"No codec table {fingerprint.hex()} to decode this state: {e}")
+                table = self._tables[fingerprint] = _Table(raw["texts"], raw["fields"])
+            return table
+
+    def _encode_keys(self, mapping):
+        return {self.table.field_ids.get(k, k): v for k, v in mapping.items()}
+
+    def _encode_message(self, message):
+        if set(message) != {"role", "content"} or not isinstance(message["content"], str):
+            return message
+        role = ROLE_IDS.get(message["role"], message["role"])
+        return [role, self.table.text_ids.get(message["content"], message["content"])]
+
+    def encode(self, state):
+        """Encodes a state, or a state delta from state_store.state_delta."""
+        if not self._table_saved:
+            with self._lock:
+                if not self._table_saved:
+                    self._save_table(self.table)
+                    self._table_saved = True
+        rest = {k: v for k, v in state.items() if k not in ("answers", "messages", "attempt_counter")}
+        body = [None] * 4
+        if "answers" in state:
+            body[ANSWERS] = self._encode_keys(state["answers"])
+        if "messages" in state:
+            body[MESSAGES] = [self._encode_message(m) for m in state["messages"]]
+        if "attempt_counter" in state:
+            body[ATTEMPTS] = self._encode_keys(state["attempt_counter"])
+        body[REST] = rest
+
+        payload = msgpack.packb(body, use_bin_type=True)
+        flags = 0
+        if self.compress and len(payload) >= COMPRESS_MIN_BYTES:
+            payload = zstandard.ZstdCompressor().compress(payload)
+            flags |= FLAG_ZSTD
+        return HEADER.pack(MAGIC, FORMAT_VERSION, flags, self.table.fingerprint) + payload
+
+    def decode(self, data):
+        data = bytes(data)
+        if len(data) < HEADER.size or not is_encoded(data):
+            raise StateCodecError("Not an encoded state")
+        _, version, flags, fingerprint = HEADER.unpack_from(data)
+        if version != FORMAT_VERSION:
+            raise StateCodecError(f"Unsupported state format version {version}")
+        payload = data[HEADER.size:]
+        if flags & FLAG_ZSTD:
+            if zstandard is None:
+                raise StateCodecError("This state is zstd-compressed, install the zstandard package")
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+        body = msgpack.unpackb(payload, raw=False, strict_map_key=False)
+        table = self._get_table(fingerprint)
+
+        def decode_keys(mapping):
+            return {table.fields[k] if isinstance(k, int) else k: v for k, v in mapping.items()}
+
+        def decode_message(message):
+            if isinstance(message, dict):
+                return message
+            role, content = message
+            return {
+                "role": ROLES[role] if isinstance(role, int) else role,
+                "content": table.texts[content] if isinstance(content, int) else content,
+            }
+
+        state = {}
+        if body[ANSWERS] is not None:
+            state["answers"] = decode_keys(body[ANSWERS])
+        if body[MESSAGES] is not None:
+            state["messages"] = [decode_message(m) for m in body[MESSAGES]]
+        if body[ATTEMPTS] is not None:
+            state["attempt_counter"] = decode_keys(body[ATTEMPTS])
+        state.update(body[REST])
+        return state
+
+    def loads(self, data):
+        """Decodes encoded bytes, or parses JSON text or bytes."""
+        if is_encoded(data):
+            return self.decode(data)
+        return json.loads(data)
@@ -0,0 +1,492 @@
+"""
+Conversation state storage.
+
+app.py keeps conversation states in a StateStore. Every state has a version
+that goes up by one on each save. A save names the version it was loaded
+at and fails with VersionConflict if another request saved in between, so
+two concurrent /chat-step calls for one conversation can't silently
+overwrite each other.
+
+A save doesn't rewrite the whole state. It appends a delta of that turn's
+changes (new and removed answers, new messages, index moves) to the
+conversation's journal. Every COMPACT_EVERY saves the full state is written
+as a new snapshot and the journal is cleared; loading replays the journal
+on top of the last snapshot. Snapshots and deltas record their version and
+only deltas newer than the snapshot are replayed, so a journal left behind
+by a crash before it was cleared doesn't undo the saves in the snapshot.
+
+Backends, picked with STATE_BACKEND:
+  - "sqlite" (default): one WAL-mode SQLite file, each save is one transaction.
+    Given a state_codec.StateCodec, snapshots and deltas are stored in its
+    compact encoding; rows written as JSON stay readable.
+  - "json": the original conversations/<id>.json files, written atomically,
+    with the journal in conversations/<id>.journal. Version checks only hold
+    within one process. Kept for compatibility; trainning/migrate_conversations.py
+    imports these files into SQLite.
+"""
+import copy
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+STATE_DIR = "conversations"
+STATE_DB_PATH = os.path.join(STATE_DIR, "state.sqlite3")
+# Saves between two snapshots
+COMPACT_EVERY = 20
+# Conversations whose last loaded state is kept to diff the next save against
+MAX_BASELINES = 1024
+_MISSING = object()
+# Key holding the version of a JSON snapshot file, not part of the state
+SNAPSHOT_VERSION_KEY = "_version"
+
+
+class VersionConflict(Exception):
+    pass
+
+
+def state_delta(old, new):
+    """The changes that turn state `old` into state `new`, see apply_delta."""
+    delta = {}
+    old_answers, new_answers = old.get("answers", {}), new.get("answers", {})
+    changed = {k: v for k, v in new_answers.items() if old_answers.get(k, _MISSING) != v}
+    removed = [k for k in old_answers if k not in new_answers]
+    if changed:
+        delta["answers"] = changed
+    if removed:
+        delta["answers_removed"] = removed
+
+    old_messages, new_messages = old.get("messages", []), new.get("messages", [])
+    n = len(old_messages)
+    if new_messages[:n] == old_messages:
+        if len(new_messages) > n:
+            delta["messages_from"] = n
+            delta["messages"] = new_messages[n:]
+    else:
+        # compact_history replaced older messages with a summary
+        delta["messages_from"] = 0
+        delta["messages"] = new_messages
+
+    changed = {k: v for k, v in new.items() if k not in ("answers", "messages") and old.get(k, _MISSING) != v}
+    if changed:
+        delta["set"] = changed
+    removed = [k for k in old if k not in new]
+    if removed:
+        delta["unset"] = removed
+    return delta
+
+
+def apply_delta(state, delta):
+    """Applies a delta from state_delta to `state` in place."""
+    if "answers" in delta or "answers_removed" in delta:
+        answers = state.setdefault("answers", {})
+        answers.update(delta.get("answers", {}))
+        for key in delta.get("answers_removed", ()):
+            answers.pop(key, None)
+    if "messages" in delta:
+        messages = state.setdefault("messages", [])
+        messages[delta["messages_from"]:] = delta["messages"]
+    state.update(delta.get("set", {}))
+    for key in delta.get("unset", ()):
+        state.pop(key, None)
+    return state
+
+
+def copy_state(state):
+    """A copy of `state` that later in-place edits of either side don't affect."""
+    # Messages are appended or replaced but never edited, a shallow copy of the list will do
+    return {k: list(v) if k == "messages" else copy.deepcopy(v) for k, v in state.items()}
+
+
+class _Baselines:
+    """Copies of the states last loaded or saved, keyed by conversation, LRU-bounded."""
+
+    def __init__(self, size=MAX_BASELINES):
+        self.size = size
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+
+    def remember(self, conversation_id, version, state):
+        with self._lock:
+            self._states[conversation_id] = (version, copy_state(state))
+            self._states.move_to_end(conversation_id)
+            while len(self._states) > self.size:
+                self._states.popitem(last=False)
+
+    def get(self, conversation_id, version):
+        with self._lock:
+            entry = self._states.get(conversation_id)
+        if entry is None or entry[0] != version:
+            return None
+        return entry[1]
+
+    def forget(self, conversation_id):
+        with self._lock:
+            self._states.pop(conversation_id, None)
+
+
+class StateStore:
+    """Interface of the state backends."""
+
+    def create(self, conversation_id, state):
+        """Stores the state of a new conversation. Returns its version."""
+        raise NotImplementedError
+
+    def load(self, conversation_id):
+        """(state, version) of the conversation, or None if it doesn't exist."""
+        raise NotImplementedError
+
+    def save(self, conversation_id, state, expected_version=None, new_version=None):
+        """
+        Replaces the state and returns the new version. Raises VersionConflict
+        if the stored version is not `expected_version` (None skips the check).
+        The new version is `new_version` if given, the stored one plus 1 otherwise.
+        """
+        raise NotImplementedError
+
+    def delete(self, conversation_id):
+        """Removes the conversation. Returns False if it didn't exist."""
+        raise NotImplementedError
+
+    def conversation_ids(self):
+        raise NotImplementedError
+
+
+def next_version(current, new_version=None):
+    """The version a save after `current` gets, `new_version` if the caller picked one."""
+    if new_version is None:
+        return current + 1
+    if new_version <= current:
+        raise ValueError(f"New version {new_version} is not after the stored version {current}")
+    return new_version
+
+
+class SQLiteStateStore(StateStore):
+    def __init__(self, path=STATE_DB_PATH, compact_every=COMPACT_EVERY, durable=False, codec=None):
+        self.path = path
+        self.compact_every = compact_every
+        self.codec = codec
+        # FULL syncs the WAL on every commit, NORMAL only survives an app crash, not a power loss
+        self.synchronous = "FULL" if durable else "NORMAL"
+        self._local = threading.local()
+        self._baselines = _Baselines()
+        self.stats = {"deltas": 0, "snapshots": 0, "bytes_written": 0}
+        db = self._db()
+        # `state` is the snapshot taken at `snapshot_version`, the journal holds the later deltas
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS conversations ("
+            "id TEXT PRIMARY KEY, state TEXT NOT NULL, version INTEGER NOT NULL, "
+            "question_index INTEGER NOT NULL, created REAL NOT NULL, updated REAL NOT NULL, "
+            "snapshot_version INTEGER)"
+        )
+        columns = {row[1] for row in db.execute("PRAGMA table_info(conversations)")}
+        if "snapshot_version" not in columns:
+            # Stores created before the journal hold full states only
+            db.execute("ALTER TABLE conversations ADD COLUMN snapshot_version INTEGER")
+        db.execute("CREATE INDEX IF NOT EXISTS conversations_updated ON conversations (updated)")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS journal ("
+            "conversation_id TEXT NOT NULL, version INTEGER NOT NULL, delta TEXT NOT NULL, "
+            "PRIMARY KEY (conversation_id, version)) WITHOUT ROWID"
+        )
+
+    def _db(self):
+        # sqlite3 connections can't be shared between threads, one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"PRAGMA synchronous={self.synchronous}")
+            self._local.db = db
+        return db
+
+    def _dumps(self, state):
+        return self.codec.encode(state) if self.codec else json.dumps(state)
+
+    def _loads(self, data):
+        return self.codec.loads(data) if self.codec else json.loads(data)
+
+    def _materialize(self, db, conversation_id):
+        row = db.execute(
+            "SELECT state, version, snapshot_version FROM conversations WHERE id = ?", (conversation_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        state, version, snapshot_version = self._loads(row[0]), row[1], row[2]
+        if snapshot_version is not None and snapshot_version < version:
+            for (delta,) in db.execute(
+                "SELECT delta FROM journal WHERE conversation_id = ? AND version > ? ORDER BY version",
+                (conversation_id, snapshot_version),
+            ):
+                apply_delta(state, self._loads(delta))
+        return state, version
+
+    def _write_snapshot(self, db, conversation_id, state, version, now):
+        data = self._dumps(state)
+        db.execute(
+            "INSERT INTO conversations (id, state, version, question_index, created, updated, snapshot_version) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET state = excluded.state, version = excluded.version, "
+            "question_index = excluded.question_index, updated = excluded.updated, "
+            "snapshot_version = excluded.snapshot_version",
+            (conversation_id, data, version, state.get("question_index", 0), now, now, version),
+        )
+        db.execute("DELETE FROM journal WHERE conversation_id = ?", (conversation_id,))
+        self.stats["snapshots"] += 1
+        self.stats["bytes_written"] += len(data)
+
+    def create(self, conversation_id, state):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            if db.execute("SELECT 1 FROM conversations WHERE id = ?", (conversation_id,)).fetchone():
+                raise VersionConflict(f"Conversation {conversation_id} already exists")
+            self._write_snapshot(db, conversation_id, state, 1, time.time())
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._baselines.remember(conversation_id, 1, state)
+        return 1
+
+    def load(self, conversation_id):
+        db = self._db()
+        # One read transaction, so the snapshot and the journal tail match
+        db.execute("BEGIN")
+        try:
+            loaded = self._materialize(db, conversation_id)
+        finally:
+            db.execute("COMMIT")
+        if loaded is not None:
+            self._baselines.remember(conversation_id, loaded[1], loaded[0])
+        return loaded
+
+    def save(self, conversation_id, state, expected_version=None, new_version=None):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute(
+                "SELECT version, snapshot_version FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if expected_version is not None and (row is None or row[0] != expected_version):
+                raise VersionConflict(
+                    f"Conversation {conversation_id} is at version {row[0] if row else None}, "
+                    f"expected {expected_version}"
+                )
+            now = time.time()
+            if row is None:
+                version = next_version(0, new_version)
+                self._write_snapshot(db, conversation_id, state, version, now)
+            else:
+                current, snapshot_version = row
+                version = next_version(current, new_version)
+                if snapshot_version is None or version - snapshot_version >= self.compact_every:
+                    self._write_snapshot(db, conversation_id, state, version, now)
+                else:
+                    previous = self._baselines.get(conversation_id, current)
+                    if previous is None:
+                        previous, _ = self._materialize(db, conversation_id)
+                    delta = self._dumps(state_delta(previous, state))
+                    db.execute(
+                        "INSERT INTO journal (conversation_id, version, delta) VALUES (?, ?, ?)",
+                        (conversation_id, version, delta),
+                    )
+                    db.execute(
+                        "UPDATE conversations SET version = ?, question_index = ?, updated = ? WHERE id = ?",
+                        (version, state.get("question_index", 0), now, conversation_id),
+                    )
+                    self.stats["deltas"] += 1
+                    self.stats["bytes_written"] += len(delta)
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._baselines.remember(conversation_id, version, state)
+        return version
+
+    def delete(self, conversation_id):
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            db.execute("DELETE FROM journal WHERE conversation_id = ?", (conversation_id,))
+            cursor = db.execute("DELETE FROM conversations WHERE id = ?", (conversation_id,))
+            db.execute("COMMIT")
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        self._baselines.forget(conversation_id)
+        return cursor.rowcount > 0
+
+    def conversation_ids(self):
+        return [row[0] for row in self._db().execute("SELECT id FROM conversations ORDER BY updated")]
+
+
+class JSONFileStateStore(StateStore):
+    """
+    The original one-file-per-conversation layout: <id>.json is the last
+    snapshot, <id>.journal holds one {"version", "delta"} JSON object per
+    line. Versions are recorded in the files, but version checks only hold
+    within one process.
+    """
+
+    def __init__(self, directory=STATE_DIR, compact_every=COMPACT_EVERY, durable=False):
+        self.directory = directory
+        self.compact_every = compact_every
+        # fsync every write before returning
+        self.durable = durable
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._versions = {}
+        # Deltas in each conversation's journal newer than its snapshot
+        self._journal_lengths = {}
+        self._baselines = _Baselines()
+        self.stats = {"deltas": 0, "snapshots": 0, "bytes_written": 0}
+
+    def path(self, conversation_id):
+        return os.path.join(self.directory, f"{conversation_id}.json")
+
+    def journal_path(self, conversation_id):
+        return os.path.join(self.directory, f"{conversation_id}.journal")
+
+    def _write_snapshot(self, conversation_id, state, version):
+        path = self.path(conversation_id)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        data = json.dumps({**state, SNAPSHOT_VERSION_KEY: version})
+        with open(tmp_path, "w") as f:
+            f.write(data)
+            if self.durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        # A crash before this line leaves a journal already folded into the snapshot, _read skips its deltas
+        try:
+            os.remove(self.journal_path(conversation_id))
+        except FileNotFoundError:
+            pass
+        self._journal_lengths[conversation_id] = 0
+        self.stats["snapshots"] += 1
+        self.stats["bytes_written"] += len(data)
+
+    def _read(self, conversation_id):
+        """The stored state and its version, None if there is none."""
+        try:
+            with open(self.path(conversation_id), "r") as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        # Snapshots written before versions were recorded have none
+        snapshot_version = state.pop(SNAPSHOT_VERSION_KEY, None)
+        version = snapshot_version or 0
+        length = 0
+        try:
+            with open(self.journal_path(conversation_id), "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A save interrupted mid-line, nothing after it was acknowledged
+                        break
+                    if "delta" in entry:
+                        if entry["version"] <= version:
+                            # Already folded into the snapshot
+                            continue
+                        version, delta = entry["version"], entry["delta"]
+                    elif snapshot_version is None:
+                        # Unversioned journal of an unversioned snapshot
+                        version, delta = version + 1, entry
+                    else:
+                        # Unversioned journal left behind by the snapshot that replaced it
+                        continue
+                    apply_delta(state, delta)
+                    length += 1
+        except FileNotFoundError:
+            pass
+        self._journal_lengths[conversation_id] = length
+        return state, version
+
+    def create(self, conversation_id, state):
+        with self._lock:
+            if os.path.exists(self.path(conversation_id)):
+                raise VersionConflict(f"Conversation {conversation_id} already exists")
+            self._write_snapshot(conversation_id, state, 1)
+            self._versions[conversation_id] = 1
+            self._baselines.remember(conversation_id, 1, state)
+            return 1
+
+    def load(self, conversation_id):
+        with self._lock:
+            loaded = self._read(conversation_id)
+            if loaded is None:
+                return None
+            state, version = loaded
+            self._versions[conversation_id] = version
+            self._baselines.remember(conversation_id, version, state)
+            return state, version
+
+    def save(self, conversation_id, state, expected_version=None, new_version=None):
+        with self._lock:
+            previous = None
+            if conversation_id not in self._versions:
+                # Not loaded by this process, the files hold its version
+                loaded = self._read(conversation_id)
+                if loaded is not None:
+                    previous, self._versions[conversation_id] = loaded
+            current = self._versions.get(conversation_id, 0)
+            if expected_version is not None and current != expected_version:
+                raise VersionConflict(
+                    f"Conversation {conversation_id} is at version {current}, expected {expected_version}"
+                )
+            version = next_version(current, new_version)
+            previous = previous or self._baselines.get(conversation_id, current)
+            if previous is None and os.path.exists(self.path(conversation_id)):
+                previous, _ = self._read(conversation_id)
+            if previous is None or self._journal_lengths.get(conversation_id, 0) + 1 >= self.compact_every:
+                self._write_snapshot(conversation_id, state, version)
+            else:
+                line = json.dumps({"version": version, "delta": state_delta(previous, state)}) + "\n"
+                with open(self.journal_path(conversation_id), "a") as f:
+                    f.write(line)
+                    if self.durable:
+                        f.flush()
+                        os.fsync(f.fileno())
+                self._journal_lengths[conversation_id] += 1
+                self.stats["deltas"] += 1
+                self.stats["bytes_written"] += len(line)
+            self._versions[conversation_id] = version
+            self._baselines.remember(conversation_id, version, state)
+            return version
+
+    def delete(self, conversation_id):
+        with self._lock:
+            self._versions.pop(conversation_id, None)
+            self._journal_lengths.pop(conversation_id, None)
+            self._baselines.forget(conversation_id)
+            try:
+                os.remove(self.journal_path(conversation_id))
+            except FileNotFoundError:
+                pass
+            try:
+                os.remove(self.path(conversation_id))
+                return True
+            except FileNotFoundError:
+                return False
+
+    def conversation_ids(self):
+        return [name[:-len(".json")] for name in os.listdir(self.directory) if name.endswith(".json")]
+
+
+def get_state_store(backend=None, durable=False, codec=None):
+    """
+    The store selected by `backend` or the STATE_BACKEND environment variable.
+    A durable store fsyncs every save before returning. The SQLite store
+    writes with `codec` if given, the JSON store always writes JSON.
+    """
+    backend = backend or os.environ.get("STATE_BACKEND", "sqlite")
+    if backend == "json":
+        return JSONFileStateStore(durable=durable)
+    if backend == "sqlite":
+        os.makedirs(os.path.dirname(STATE_DB_PATH), exist_ok=True)
+        return SQLiteStateStore(durable=durable, codec=codec)
+    raise ValueError(f"Unknown STATE_BACKEND '{backend}', use 'sqlite' or 'json'")
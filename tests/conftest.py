@@ -0,0 +1,13 @@
+import pytest
+
+
+@pytest.fixture
+def make_state():
+    """Builds a conversation state at `index`, with one answer and one message per earlier question by default."""
+    def make(index, answers=None, messages=None):
+        if answers is None:
+            answers = {f"f{i}": i for i in range(index)}
+        if messages is None:
+            messages = [f"m{i}" for i in range(index)]
+        return {"answers": dict(answers), "messages": list(messages), "question_index": index, "skip": 0}
+    return make
@@ -0,0 +1,24 @@
+import pytest
+
+from answer_classifier import ClassifierStats, classify_answer
+
+
+@pytest.mark.parametrize("field", ["residence_country", "alternate_phone_country", "has_fax_number",
+                                   "has_primary_phone", "alternate_phone_type"])
+def test_numbers_are_not_settled_for_non_numeric_fields(field):
+    assert classify_answer("Which one?", field, "12?") is None
+
+
+@pytest.mark.parametrize("field", ["passport_number", "primary_phone_country_code", "fax_extension",
+                                   "uscis_number_2"])
+def test_numbers_are_settled_for_numeric_fields(field):
+    assert classify_answer("Which one?", field, "12") == {"status": "VALID", "value": "12"}
+
+
+def test_stats_summary():
+    stats = ClassifierStats()
+    for result in [{"status": "VALID"}, {"status": "QUESTION"}, None, None]:
+        stats.record(result)
+    summary = stats.summary()
+    assert summary["llm_calls_saved"] == 2
+    assert summary["escalation_rate"] == 0.5
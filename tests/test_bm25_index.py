@@ -0,0 +1,36 @@
+import numpy as np
+
+from bm25_index import BM25Index, load_bm25_index, tokenize
+
+DOCS = [
+    "Form IMM 5645 family information for every applicant",
+    "A CAQ is needed to study in Quebec",
+    "Study permit applicants show proof of funds for tuition",
+    "Common-law partners have lived together for one year",
+]
+
+
+def test_form_numbers_match_however_they_are_written():
+    assert "imm5645" in tokenize("imm-5645") and "imm5645" in tokenize("IMM5645")
+    index = BM25Index.build(DOCS)
+    for query in ("IMM 5645", "imm-5645", "imm5645"):
+        assert list(index.search([query], 2)[0][0]) == [0]
+
+
+def test_documents_without_query_terms_are_left_out():
+    ids, scores = BM25Index.build(DOCS).search(["CAQ Quebec", "passport"], 3)
+    assert list(ids[0]) == [1]
+    assert len(ids[1]) == 0 and len(scores[1]) == 0
+
+
+def test_added_documents_are_searched_before_and_after_compact(tmp_path):
+    index = BM25Index.build(DOCS)
+    index.add_documents(["Biometrics are collected at a visa application centre"])
+    assert list(index.search(["biometrics"], 1)[0][0]) == [4]
+    path = str(tmp_path / "bm25.npz")
+    index.save(path)
+    loaded = load_bm25_index(5, path)
+    assert list(loaded.search(["biometrics"], 1)[0][0]) == [4]
+    assert np.allclose(loaded.scores("study tuition"), index.scores("study tuition"))
+    assert load_bm25_index(4, path) is None
+
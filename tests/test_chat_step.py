@@ -0,0 +1,169 @@
+import copy
+from types import SimpleNamespace
+
+import pytest
+
+try:
+    import chatbot_copy
+except Exception as e:
+    # Importing the chatbot loads the document store and indexes built into others/
+    pytest.skip(f"chatbot_copy can't be imported here: {e}", allow_module_level=True)
+
+from answer_cache import SemanticAnswerCache
+from chatbot_copy import call_llm, chat_step, edit_answer, questions
+from dli_lookup import NO_MATCH
+
+
+def position(field):
+    return next(q.position for q in questions if q.field == field)
+
+
+def state_at(field, answers):
+    return {"answers": dict(answers), "messages": [{"role": "system", "content": chatbot_copy.system_message}],
+            "question_index": position(field), "skip": 0, "attempt_counter": {}}
+
+
+def test_dli_city_match_alone_is_not_accepted():
+    state = state_at("school_dli#", {"school_name": "University of Toronto", "school_city": "Waterloo"})
+    result = chat_step(state, "")
+    assert "school_dli#" not in result["state"]["answers"]
+    candidates = result["state"]["dli_candidates"]
+    assert {c["school"] for c in candidates} >= {"university of toronto", "university of waterloo"}
+    assert result["state"]["question_index"] == position("school_dli#")
+
+    pick = next(i for i, c in enumerate(candidates, 1) if c["school"] == "university of toronto")
+    result = chat_step(result["state"], str(pick))
+    assert result["state"]["answers"]["school_dli#"] == ["O19332746152"]
+    assert "dli_candidates" not in result["state"]
+    assert result["state"]["question_index"] == position("school_dli#") + 1
+
+
+def test_dli_confirmation_accepts_typed_number_and_none():
+    answers = {"school_name": "University of Toronto", "school_city": "Waterloo"}
+    pending = chat_step(state_at("school_dli#", answers), "")["state"]
+    assert chat_step(copy.deepcopy(pending), "o12345678901")["state"]["answers"]["school_dli#"] == ["O12345678901"]
+    assert chat_step(copy.deepcopy(pending), "0")["state"]["answers"]["school_dli#"] == NO_MATCH
+    assert "dli_candidates" in chat_step(copy.deepcopy(pending), "the second one")["state"]
+
+
+def test_dli_confident_match_is_recorded():
+    state = state_at("school_dli#", {"school_name": "Univ of Waterloo", "school_city": "Waterloo"})
+    result = chat_step(state, "")
+    assert result["state"]["answers"]["school_dli#"] == ["O19305471522"]
+
+
+def test_dli_turn_searches_once(monkeypatch):
+    calls = []
+    search = chatbot_copy.dli_index.search
+    monkeypatch.setattr(chatbot_copy.dli_index, "search", lambda *args, **kwargs: calls.append(args) or search(*args, **kwargs))
+    chat_step(state_at("school_dli#", {"school_name": "University of Toronto", "school_city": "Waterloo"}), "")
+    assert len(calls) == 1
+
+
+def test_dli_override_records_typed_answer():
+    answers = {"school_name": "University of Toronto", "school_city": "Waterloo"}
+    state = chat_step(state_at("school_dli#", answers), "")["state"]
+    state = chat_step(state, "the second one")["state"]
+    result = chat_step(state, "the one in Toronto")
+    assert "OVERRIDE" in result["reply"]
+    result = chat_step(result["state"], "OVERRIDE")
+    assert result["state"]["override_mode"]
+    result = chat_step(result["state"], "My school's DLI")
+    assert result["state"]["answers"]["school_dli#"] == ["My school's DLI"]
+    assert result["state"]["question_index"] == position("school_dli#") + 1
+
+
+def test_edit_to_ambiguous_school_asks_again():
+    answers = {q.field: "x" for q in questions[:position("school_dli#")]}
+    answers.update({"school_name": "University of Waterloo", "school_city": "Waterloo",
+                    "school_dli#": ["O19305471522"]})
+    state = state_at("level_of_study", answers)
+    result = edit_answer(state, "school_name", "University of Toronto")
+    assert "school_dli#" in result["invalidated"]
+    assert "school_dli#" not in result["state"]["answers"]
+
+
+def answered_up_to(field, **answers):
+    state = state_at(field, {q.field: "x" for q in questions[:position(field)]})
+    state["answers"].update(answers)
+    return state
+
+
+def test_edit_rejects_invalid_phone_number():
+    state = answered_up_to("alternate_phone_country_code", primary_phone_country_code="1",
+                           primary_phone_number="4165550123", primary_phone_extension="")
+    result = edit_answer(state, "primary_phone_number", "12")
+    assert result["reply"].startswith("❌")
+    assert result["state"]["answers"]["primary_phone_number"] == "4165550123"
+    assert edit_answer(state, "primary_phone_number", "6475550188")["state"]["answers"]["primary_phone_number"] == "6475550188"
+
+
+def test_edit_of_repeated_field_needs_its_position():
+    repeated = [q.position for q in questions if q.field == "minor_status"]
+    state = answered_up_to(questions[repeated[-1] + 1].field, minor_status="No")
+    result = edit_answer(state, "minor_status", "Yes")
+    assert result["reply"].startswith("❌")
+    assert result["state"]["answers"]["minor_status"] == "No"
+    assert edit_answer(state, "minor_status", "Yes", position(questions[0].field))["reply"].startswith("❌")
+    assert edit_answer(state, "minor_status", "Yes", repeated[-1])["state"]["answers"]["minor_status"] == "Yes"
+
+
+@pytest.fixture
+def text_question(monkeypatch):
+    q = next(q for q in questions if q.kind == "text" and not q.options and not q.asks_loc_date_phone)
+    monkeypatch.setattr(chatbot_copy, "validate_with_llm", lambda messages: {"status": "QUESTION", "value": ""})
+    monkeypatch.setattr(chatbot_copy, "general_llm", lambda messages: "general answer")
+    monkeypatch.setattr(chatbot_copy, "call_llm", lambda *args, **kwargs: "retrieved answer")
+    return q
+
+
+@pytest.mark.parametrize("user_input", ["what does this mean?", "can you explain this?",
+                                        "what should I put here?", "huh?"])
+def test_generic_question_gets_precomputed_clarification(monkeypatch, text_question, user_input):
+    monkeypatch.setitem(chatbot_copy.default_clarifications, text_question.field,
+                        {"question": text_question.text, "answer": "precomputed answer"})
+    result = chat_step(state_at(text_question.field, {}), user_input)
+    assert result["reply"] == "precomputed answer"
+    assert text_question.field not in result["state"]["answers"]
+
+
+def test_stale_clarification_is_not_served(monkeypatch, text_question):
+    monkeypatch.setitem(chatbot_copy.default_clarifications, text_question.field,
+                        {"question": "An older wording of the question", "answer": "precomputed answer"})
+    result = chat_step(state_at(text_question.field, {}), "what does this mean?")
+    assert result["reply"] == "general answer"
+
+
+class StubClient:
+    """Answers chat with a fixed text and fails every rerank."""
+
+    def __init__(self):
+        self.documents = None
+
+    def chat(self, model, messages, documents=None, **kwargs):
+        self.documents = documents
+        content = [SimpleNamespace(text="stub answer")]
+        return SimpleNamespace(message=SimpleNamespace(content=content, citations=[], tool_calls=None))
+
+    def rerank(self, **kwargs):
+        raise RuntimeError("rerank is down")
+
+
+def test_call_llm_answers_lexically_when_embed_fails(monkeypatch):
+    if chatbot_copy.bm25_index is None:
+        pytest.skip("no BM25 index in others/")
+
+    def embed_down(*args, **kwargs):
+        raise RuntimeError("embed is down")
+
+    client = StubClient()
+    monkeypatch.setattr(chatbot_copy, "co", client)
+    monkeypatch.setattr(chatbot_copy.query_embedding_cache, "embed", embed_down)
+    monkeypatch.setattr(chatbot_copy, "answer_cache", SemanticAnswerCache())
+    monkeypatch.setattr(chatbot_copy, "plan_queries", lambda *args: (["study permit IMM 1294"], 1.0))
+
+    field = questions[0].field
+    messages = [{"role": "user", "content": "Do I need the IMM 1294 form for a study permit?"}]
+    assert call_llm(messages, questions[0].text, field) == "stub answer"
+    assert client.documents
+    assert not chatbot_copy.answer_cache.stats["hits"]
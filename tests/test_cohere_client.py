@@ -0,0 +1,64 @@
+import json
+
+import httpx
+import pytest
+from cohere.core.api_error import ApiError
+
+import cohere_client
+from cohere_client import DeadlineExceeded, TokenBucket, get_client
+from trainning.cohere_stub_server import EMBED_DIMENSION, respond
+
+
+def flaky_transport(failures, error_status=503):
+    """Answers like the stub server after `failures` errors."""
+    calls = []
+
+    def handle(request):
+        calls.append(request.url.path)
+        if len(calls) <= failures:
+            return httpx.Response(error_status, json={"message": "stub error"})
+        status, payload = respond(request.url.path, json.loads(request.content or b"{}"))
+        return httpx.Response(status, json=payload)
+
+    return httpx.MockTransport(handle), calls
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(cohere_client.time, "sleep", lambda seconds: None)
+
+
+def test_retries_server_errors():
+    transport, calls = flaky_transport(2)
+    client = get_client("key", transport=transport)
+    embeddings = client.embed(model="embed-v4.0", input_type="search_query", texts=["DLI"],
+                              embedding_types=["float"]).embeddings.float
+    assert len(embeddings[0]) == EMBED_DIMENSION
+    assert calls == ["/v2/embed"] * 3
+    assert client.stats["retries"] == 2 and client.stats["failures"] == 0
+
+
+def test_client_errors_are_not_retried():
+    transport, calls = flaky_transport(1, error_status=400)
+    client = get_client("key", transport=transport)
+    with pytest.raises(ApiError):
+        client.chat(model="command-a-03-2025", messages=[{"role": "user", "content": "hi"}])
+    assert len(calls) == 1
+    assert client.stats["failures"] == 1
+
+
+def test_same_key_shares_one_client():
+    transport, _ = flaky_transport(0)
+    assert get_client("key", transport=transport) is get_client("key", transport=transport)
+
+
+def test_rate_limit_wait_counts_against_the_deadline():
+    bucket = TokenBucket(rate=0.01, capacity=1)
+    assert bucket.acquire(timeout=0)
+    assert not bucket.acquire(timeout=0.1)
+
+    transport, _ = flaky_transport(0)
+    client = get_client("key", transport=transport)
+    client._limiters = {"chat": bucket}
+    with pytest.raises(DeadlineExceeded):
+        client.chat(model="command-a-03-2025", messages=[{"role": "user", "content": "hi"}], deadline=1)
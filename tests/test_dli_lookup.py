@@ -0,0 +1,35 @@
+import os
+
+import pandas as pd
+
+from dli_lookup import DLIIndex, fuzzy_key, is_dli_number
+
+
+def write_sheet(path, rows):
+    pd.DataFrame(rows, columns=["School", "DLI # ", "City"]).to_excel(path, index=False)
+
+
+def test_lookup_ignores_case_and_spacing(tmp_path):
+    path = str(tmp_path / "schools.xlsx")
+    write_sheet(path, [["University of Waterloo", "O19305471522", "Waterloo"],
+                       ["University of Waterloo", "O19305471599", "Waterloo"],
+                       ["Seneca College", "O19395677019", "Toronto"]])
+    index = DLIIndex(path)
+    assert index.lookup(" university of  WATERLOO ", "waterloo") == ["O19305471522", "O19305471599"]
+    assert index.lookup("Seneca College", "Waterloo") == []
+    assert index.best_match("Univ. of Waterloo", "Waterloo")[0] == ["O19305471522", "O19305471599"]
+
+
+def test_changed_sheet_is_reloaded(tmp_path):
+    path = str(tmp_path / "schools.xlsx")
+    write_sheet(path, [["Seneca College", "O19395677019", "Toronto"]])
+    index = DLIIndex(path, check_interval=0)
+    write_sheet(path, [["Seneca College", "O19395677019", "Toronto"], ["Humber College", "O19395164752", "Toronto"]])
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10 ** 9))
+    assert index.lookup("Humber College", "Toronto") == ["O19395164752"]
+    assert len(index) == 2
+
+
+def test_keys_and_numbers():
+    assert fuzzy_key("Univ. of Montréal Inc.") == "university of montreal"
+    assert is_dli_number(" o19305471522 ") and not is_dli_number("19305471522")
@@ -0,0 +1,44 @@
+import json
+
+import numpy as np
+import pytest
+
+from doc_store import DocStore, StoreError, build_store
+
+DOCS = [{"title": "CAQ", "data": "Québec acceptance certificate"}, {"title": "DLI", "data": "Designated institution"}]
+
+
+def test_built_store_reads_back(tmp_path):
+    path = str(tmp_path / "store")
+    embeddings = np.eye(2, 4, dtype=np.float32)
+    manifest = build_store(embeddings, DOCS, "embed-v4.0", path)
+    store = DocStore.open(path)
+    assert store.version == manifest["checksum"]
+    assert np.array_equal(store.embeddings, embeddings)
+    assert list(store.documents) == DOCS
+    assert store.documents[-1] == DOCS[-1]
+    assert store.verify()
+
+
+def test_rebuild_changes_the_version(tmp_path):
+    path = str(tmp_path / "store")
+    first = build_store(np.eye(2, 4), DOCS, "embed-v4.0", path)["checksum"]
+    second = build_store(np.eye(2, 4), DOCS[::-1], "embed-v4.0", path)["checksum"]
+    assert first != second
+    assert DocStore.open(path).documents[0] == DOCS[1]
+
+
+def test_missing_or_mismatched_store_is_rejected(tmp_path):
+    path = str(tmp_path / "store")
+    with pytest.raises(StoreError):
+        DocStore.open(path)
+    with pytest.raises(StoreError):
+        build_store(np.eye(3, 4), DOCS, "embed-v4.0", path)
+
+    build_store(np.eye(2, 4), DOCS, "embed-v4.0", path)
+    manifest_file = tmp_path / "store" / "manifest.json"
+    manifest = json.loads(manifest_file.read_text())
+    manifest["n_docs"] = 3
+    manifest_file.write_text(json.dumps(manifest))
+    with pytest.raises(StoreError):
+        DocStore.open(path)
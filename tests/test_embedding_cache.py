@@ -0,0 +1,56 @@
+import sqlite3
+
+import numpy as np
+
+import embedding_cache
+from embedding_cache import EmbeddingCache
+
+
+def stored_bytes(path):
+    with sqlite3.connect(path) as db:
+        return db.execute("SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings").fetchone()[0]
+
+
+def test_disk_size_is_tracked_and_bounded(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    vector_bytes = 4 * 16
+    cache = EmbeddingCache(path, max_disk_bytes=10 * vector_bytes)
+    for i in range(25):
+        cache.put(f"k{i}", np.full(16, i, dtype=np.float32))
+        # Replacing an entry doesn't count it twice
+        cache.put(f"k{i}", np.full(16, i, dtype=np.float32))
+        assert cache.disk_bytes() == stored_bytes(path) <= 10 * vector_bytes
+    assert cache.disk_bytes() == 10 * vector_bytes
+
+    # Least recently used entries went first
+    reopened = EmbeddingCache(path, max_disk_bytes=10 * vector_bytes)
+    assert reopened.get("k24") is not None
+    assert reopened.get("k0") is None
+
+
+
+def test_disk_hits_are_written_in_batches(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "TOUCH_BATCH", 3)
+    path = str(tmp_path / "cache.sqlite3")
+    writer = EmbeddingCache(path)
+    for i in range(3):
+        writer.put(f"k{i}", np.zeros(4, dtype=np.float32))
+
+    def last_used():
+        with sqlite3.connect(path) as db:
+            return dict(db.execute("SELECT key, last_used FROM embeddings"))
+
+    before = last_used()
+    reader = EmbeddingCache(path)
+    reader.get("k0")
+    reader.get("k1")
+    assert last_used() == before
+    reader.get("k2")
+    after = last_used()
+    assert all(after[key] > before[key] for key in before)
+
+
+def test_missing_directory_is_created(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "others" / "cache.sqlite3"))
+    cache.put("k", np.zeros(4, dtype=np.float32))
+    assert cache.get("k") is not None
@@ -0,0 +1,43 @@
+import pytest
+
+import input_validation
+from gazetteer import load_gazetteer, place_key
+
+gazetteer = load_gazetteer()
+
+
+@pytest.mark.parametrize("text, code", [
+    ("U.S.A.", "US"), ("Côte d'Ivoire", "CI"), ("cote divoire", "CI"), ("Holland", "NL"),
+    ("  the Netherlands ", "NL"), ("Bharat", "IN"),
+])
+def test_country_names_and_aliases(text, code):
+    assert gazetteer.country(text)["code"] == code
+
+
+def test_unknown_places_are_not_guessed():
+    assert gazetteer.country("Narnia") is None
+    assert gazetteer.city("Springfield-on-Narnia") is None
+    assert gazetteer.city("London, Narnia") is None
+
+
+def test_city_country_picks_between_same_names():
+    assert gazetteer.city("London, UK")["country"] == "GB"
+    assert gazetteer.city("london , canada")["country"] == "CA"
+    assert gazetteer.city("Hyderabad, Pakistan")["country"] == "PK"
+    assert gazetteer.city("Montréal")["name"] == "Montreal"
+    assert gazetteer.country_by_code("in")["name"] == "India"
+
+
+def test_place_key_folds_case_accents_and_punctuation():
+    assert place_key("  Côte d'Ivoire. ") == "cote divoire"
+    assert place_key("The Gambia") == "gambia"
+
+
+def test_gazetteer_names_skip_the_geocoder(monkeypatch):
+    def no_geocoder(address):
+        raise AssertionError(f"geocoded {address}")
+
+    monkeypatch.setattr(input_validation, "is_valid_location", no_geocoder)
+    assert input_validation.get_normalized_address("Toronto", "residence_city") == "Toronto"
+    monkeypatch.setattr("builtins.input", lambda prompt: "yes")
+    assert input_validation.get_normalized_address("Holland", "residence_country") == "Netherlands"
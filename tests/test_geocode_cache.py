@@ -0,0 +1,76 @@
+import pytest
+
+import geocode_cache
+import input_validation
+from geocode_cache import MISS, GeocodeCache
+
+TORONTO = {"formattedAddress": "Toronto, ON, Canada", "city": "Toronto"}
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(geocode_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def cache(tmp_path, clock):
+    return GeocodeCache(str(tmp_path / "geocode.sqlite3"), ttl=100, not_found_ttl=10)
+
+
+def test_found_addresses_expire_after_ttl(cache, clock):
+    cache.put(" Toronto,ON ", TORONTO)
+    clock.now += 99
+    assert cache.get("toronto, on") == TORONTO
+    clock.now += 2
+    assert cache.get("toronto, on") is MISS
+    assert cache.stats["expired"] == 1
+
+
+def test_not_found_is_cached_for_the_shorter_ttl(cache, clock):
+    cache.put("Narnia", None)
+    clock.now += 9
+    assert cache.get("narnia") is None
+    assert cache.stats["not_found_hits"] == 1
+    clock.now += 2
+    assert cache.get("narnia") is MISS
+
+
+def test_disk_tier_is_shared_and_keeps_expiry(tmp_path, cache, clock):
+    cache.put("Toronto", TORONTO)
+    other = GeocodeCache(str(tmp_path / "geocode.sqlite3"), ttl=100, not_found_ttl=10)
+    assert other.get("TORONTO") == TORONTO
+    assert other.stats["disk_hits"] == 1
+    clock.now += 101
+    assert other.get("toronto") is MISS
+
+
+class Geocoder:
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def forward(self, address):
+        self.calls += 1
+        return self.responses.pop(0)
+
+
+def test_is_valid_location_caches_not_found_but_not_errors(monkeypatch, cache):
+    monkeypatch.setattr(input_validation, "geocode_cache", cache)
+    geocoder = Geocoder((503, {"message": "busy"}), (200, {"addresses": []}))
+    monkeypatch.setattr(input_validation, "geocoder", geocoder)
+
+    assert input_validation.is_valid_location("Narnia") == (False, "Radar API error: busy")
+    assert cache.get("Narnia") is MISS
+    for _ in range(2):
+        assert input_validation.is_valid_location("Narnia") == (False, input_validation.NOT_FOUND_MESSAGE)
+    assert geocoder.calls == 2
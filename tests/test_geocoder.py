@@ -0,0 +1,62 @@
+import pytest
+import requests
+
+import geocoder
+from geocoder import GeocodeError, Geocoder
+
+
+class Response:
+    def __init__(self, status_code, payload=None):
+        self.status_code = status_code
+        self.payload = payload or {}
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def radar(monkeypatch):
+    monkeypatch.setattr(geocoder.time, "sleep", lambda seconds: None)
+    client = Geocoder("key", base_url="http://radar.test")
+    replies = []
+
+    def get(url, params, timeout):
+        assert url == "http://radar.test/v1/geocode/forward" and params["query"] == "Toronto"
+        reply = replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+
+    monkeypatch.setattr(client.session, "get", get)
+    return client, replies
+
+
+def test_retries_until_an_answer(radar):
+    client, replies = radar
+    replies += [Response(503), requests.exceptions.ConnectionError("reset"), Response(200, {"addresses": []})]
+    assert client.forward("Toronto") == (200, {"addresses": []})
+    assert client.stats == {"calls": 3, "retries": 2, "failures": 0}
+
+
+def test_client_errors_are_returned_without_retrying(radar):
+    client, replies = radar
+    replies.append(Response(401, {"message": "bad key"}))
+    assert client.forward("Toronto") == (401, {"message": "bad key"})
+    assert client.stats["retries"] == 0
+
+
+def test_gives_up_after_max_retries(radar):
+    client, replies = radar
+    replies += [Response(503)] * 3
+    with pytest.raises(GeocodeError, match="503"):
+        client.forward("Toronto")
+    assert client.stats == {"calls": 3, "retries": 2, "failures": 1}
+
+
+def test_no_attempt_after_the_deadline(radar, monkeypatch):
+    client, replies = radar
+    clock = iter([0.0, 10.0])
+    monkeypatch.setattr(geocoder.time, "monotonic", lambda: next(clock))
+    with pytest.raises(GeocodeError, match="within 6s"):
+        client.forward("Toronto")
+    assert client.stats["calls"] == 0
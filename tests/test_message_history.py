@@ -0,0 +1,27 @@
+from message_history import SUMMARY_PREFIX, compact_history
+
+
+def system(content):
+    return {"role": "system", "content": content}
+
+
+def user(content):
+    return {"role": "user", "content": content}
+
+
+def test_follow_ups_on_one_question_fill_the_window():
+    messages = [system("prompt"), system("Q1"), user("a1"), {"role": "assistant", "content": "A1"}]
+    for i in range(5):
+        messages += [system("Q2"), user(f"follow-up {i}?")]
+
+    history = compact_history(messages, "Q2", window=4)
+    assert history[0] == system("prompt")
+    assert history[1]["content"].startswith(SUMMARY_PREFIX)
+    assert "Q: Q1 | User: a1 | Recorded: A1" in history[1]["content"]
+    assert history[2:] == [system("Q2"), user("follow-up 3?"), system("Q2"), user("follow-up 4?")]
+
+
+def test_short_history_about_one_question_is_kept():
+    messages = [system("prompt"), system("Q1"), user("a1"), system("Q2"), user("what?"), system("Q2"), user("why?")]
+    assert compact_history(messages, "Q2") == [
+        system("prompt"), {"role": "system", "content": SUMMARY_PREFIX + "Q: Q1 | User: a1"}] + messages[3:]
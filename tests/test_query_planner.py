@@ -0,0 +1,28 @@
+from query_planner import CONFIDENCE_THRESHOLD, field_terms, plan_queries
+
+MARITAL = "What is your current marital status? (Married/Common-Law/Single)"
+
+
+def test_form_numbers_and_acronyms_skip_the_llm():
+    queries, confidence = plan_queries("Do I need to fill IMM 5645 if I am single?", MARITAL, "marital_status")
+    assert confidence >= CONFIDENCE_THRESHOLD
+    assert queries[0].startswith("IMM 5645")
+    assert "imm" not in queries[0].lower().split()[1:]
+    assert plan_queries("Do I need a CAQ to study in Montreal?", "", "has_caq")[1] >= CONFIDENCE_THRESHOLD
+
+
+def test_vague_questions_are_left_to_the_llm():
+    queries, confidence = plan_queries("What does that mean?", MARITAL, "marital_status")
+    assert confidence < CONFIDENCE_THRESHOLD
+    # Still searchable from the form question if the LLM writes none
+    assert queries and "marital" in queries[0]
+
+
+def test_multi_part_questions_are_left_to_the_llm():
+    question = "Is common-law the same as married? And do I list my previous partner?"
+    assert plan_queries(question, MARITAL, "marital_status")[1] < CONFIDENCE_THRESHOLD
+
+
+def test_field_terms():
+    assert field_terms("school_dli#") == ["school", "dli"]
+    assert field_terms("has_children_2") == ["has", "children"]
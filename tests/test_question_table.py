@@ -0,0 +1,35 @@
+import json
+import os
+
+from question_table import COMPILED_SUFFIX, load_question_table
+
+QUESTIONS = [
+    {"position": 0, "field": "other_names", "text": "Have you ever used any other names (Yes/No)?"},
+    {"position": 1, "field": "passport_expiry_date", "text": "When does your passport expire?"},
+    {"position": 2, "field": "residence_city", "text": "Which city do you live in?"},
+    {"position": 3, "field": "primary_phone_number", "text": "What is your phone number?"},
+    {"position": 4, "field": "has_children_2", "text": "Do you have another child? (Yes/No)"},
+]
+
+
+def write_questions(path, questions):
+    path.write_text(json.dumps(questions))
+    return str(path)
+
+
+def test_questions_are_compiled_once(tmp_path):
+    path = write_questions(tmp_path / "questions.json", QUESTIONS)
+    table = load_question_table(path)
+    assert [q.kind for q in table] == ["option", "date", "address", "phone", "option"]
+    assert table[0].options == ("Yes", "No") and "yes" in table[0].options_lower
+    assert table[1].no_past_allowed and not table[1].no_future_allowed
+    assert table[4].family == "has_children"
+    assert os.path.exists(path + COMPILED_SUFFIX)
+    assert load_question_table(path) == table
+
+
+def test_changed_source_is_recompiled(tmp_path):
+    path = write_questions(tmp_path / "questions.json", QUESTIONS)
+    load_question_table(path)
+    write_questions(tmp_path / "questions.json", QUESTIONS[:2])
+    assert [q.field for q in load_question_table(path)] == ["other_names", "passport_expiry_date"]
@@ -0,0 +1,50 @@
+import numpy as np
+
+from retrieval_index import FlatIndex, IVFIndex, load_index, reciprocal_rank_fusion, top_k
+
+
+def unit_rows(n, dimension=16, seed=0):
+    vectors = np.random.default_rng(seed).normal(size=(n, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_top_k_returns_best_first():
+    assert list(top_k(np.array([0.1, 0.9, 0.5, 0.7]), 3)) == [1, 3, 2]
+    assert list(top_k(np.array([0.1]), 5)) == [0]
+
+
+def test_ivf_probing_every_cluster_matches_exact_search():
+    docs, queries = unit_rows(200), unit_rows(3, seed=1)
+    ivf = IVFIndex.build(docs, nlist=8)
+    ivf.nprobe = 8
+    ivf_ids, ivf_scores = ivf.search(queries, 5)
+    flat_ids, flat_scores = FlatIndex(docs).search(queries, 5)
+    assert np.array_equal(ivf_ids, flat_ids)
+    assert np.allclose(ivf_scores, flat_scores)
+
+
+def test_saved_index_is_used_only_for_its_documents(tmp_path):
+    docs = unit_rows(50)
+    path = str(tmp_path / "index.npz")
+    IVFIndex.build(docs, nlist=4, nprobe=2).save(path)
+    loaded = load_index(docs, path)
+    assert isinstance(loaded, IVFIndex) and loaded.nprobe == 2
+    assert isinstance(load_index(docs[:40], path), FlatIndex)
+    assert isinstance(load_index(docs, str(tmp_path / "missing.npz")), FlatIndex)
+
+
+def test_multi_query_search_matches_one_search_per_query():
+    docs, queries = unit_rows(100), unit_rows(4, seed=2)
+    index = FlatIndex(docs)
+    ids, scores = index.search(queries, 5)
+    for row, query in enumerate(queries):
+        single_ids, single_scores = index.search(query, 5)
+        assert np.array_equal(ids[row], single_ids[0])
+        assert np.allclose(scores[row], single_scores[0])
+
+
+def test_rank_fusion_prefers_documents_ranked_by_several_lists():
+    fused = reciprocal_rank_fusion([np.array([7, 3, 5]), np.array([3, 9])])
+    assert fused[0] == 3
+    assert set(fused) == {3, 5, 7, 9}
+    assert reciprocal_rank_fusion([]) == []
@@ -0,0 +1,67 @@
+import pytest
+
+from session_cache import SessionCache
+from state_store import JSONFileStateStore, SQLiteStateStore, StateStore, VersionConflict
+
+
+@pytest.fixture(params=["sqlite", "json"])
+def store(request, tmp_path):
+    if request.param == "sqlite":
+        return SQLiteStateStore(str(tmp_path / "state.sqlite3"))
+    return JSONFileStateStore(str(tmp_path))
+
+
+@pytest.fixture
+def cache(store):
+    cache = SessionCache(store, max_entries=1, flush_interval=3600)
+    yield cache
+    cache.close()
+
+
+def test_save_after_eviction_keeps_version(cache, store, make_state):
+    version = cache.create("a", make_state(0))
+    for i in range(1, 3):
+        version = cache.save("a", make_state(i), expected_version=version)
+    state, loaded_version = cache.load("a")
+    assert loaded_version == version == 3
+
+    # Another conversation pushes "a" out between the load and the save of a turn
+    cache.create("b", make_state(0))
+    assert store.load("a") == (make_state(2), 3)
+
+    version = cache.save("a", make_state(3), expected_version=loaded_version)
+    assert version == 4
+    cache.flush()
+    assert store.load("a") == (make_state(3), 4)
+
+
+def test_flush_stores_cache_version(cache, store, make_state):
+    version = cache.create("a", make_state(0))
+    for i in range(1, 4):
+        version = cache.save("a", make_state(i), expected_version=version)
+    cache.flush()
+    assert store.load("a") == (make_state(3), version)
+    with pytest.raises(VersionConflict):
+        cache.save("a", make_state(4), expected_version=version - 1)
+
+
+def test_load_after_eviction_sees_latest_state(cache, make_state):
+    version = cache.create("a", make_state(0))
+    version = cache.save("a", make_state(1), expected_version=version)
+    cache.create("b", make_state(0))
+    assert cache.load("a") == (make_state(1), version)
+
+
+def test_cache_and_stores_implement_the_interface():
+    for method in ("create", "load", "save", "delete", "conversation_ids"):
+        assert callable(getattr(StateStore, method))
+        assert getattr(SessionCache, method) is not getattr(StateStore, method)
+
+
+def test_save_with_new_version(cache, store, make_state):
+    version = cache.create("a", make_state(0))
+    assert cache.save("a", make_state(1), expected_version=version, new_version=7) == 7
+    with pytest.raises(ValueError):
+        cache.save("a", make_state(2), new_version=7)
+    cache.flush()
+    assert store.load("a") == (make_state(1), 7)
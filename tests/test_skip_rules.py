@@ -0,0 +1,86 @@
+import pytest
+
+from question_relationship import SkipRuleError, compile_skip_rules, load_skip_rules
+from question_table import load_question_table
+
+questions = load_question_table('trainning/questions_file_updated.json')
+skip_rules = load_skip_rules(questions)
+
+
+def legacy_skip(field, answers):
+    """The if-chain the rule table replaced, as it was."""
+    field_value = answers.get(field, '').lower()
+    relative = {
+        'other_names': ('no', 2), 'resided_other_countries': ('no', 9), 'resided_other_countries_2': ('no', 4),
+        'country_applying_from_same': ('no', 4), 'previous_relationship': ('no', 6), 'uci_issued': ('no', 1),
+        'nin_document': ('no', 4), 'us_permanent_resident': ('no', 2), 'mailing_address_same': ('yes', 1),
+        'has_alternate_phone': ('no', 5), 'has_fax_number': ('no', 4), 'has_provincial_attestation': ('no', 2),
+        'has_caq': ('no', 2), 'has_post_secondary_education': ('no', 8), 'employment_other': ('no', 17),
+        'employment_other_2': ('no', 8), 'criminal_history': ('no', 1), 'military_or_security_service': ('no', 5),
+        'has_children': ('no', 27), 'has_children_2': ('no', 17), 'has_children_3': ('no', 8),
+        'has_siblings': ('no', 9), 'has_siblings_2': ('no', 9), 'has_siblings_3': ('no', 9),
+        'minor_status': ('no', 6),
+    }
+    if field in relative and field_value == relative[field][0]:
+        return relative[field][1]
+    if field == 'marital_status' and field_value not in ['married', 'common-law']:
+        return 15
+    if field == 'partner_email' and answers.get('marital_status', '').lower() == 'married':
+        return 7
+    if field == 'physical_or_mental_disorder' and field_value == 'no' \
+            and answers.get('tuberculosis_exposure', '').lower() == 'no':
+        return 1
+    if field == 'previous_application_canada' and field_value == 'no' \
+            and answers.get('visa_or_entry_refused', '').lower() == 'no' \
+            and answers.get('status_violation_canada', '').lower() == 'no':
+        return 1
+    if field == 'country_applying_from_same' and field_value == 'yes':
+        answers['country_applying_from'] = answers.get('residence_country', '')
+        answers['status_country_applying_from'] = answers.get('residence_status', '')
+        answers['current_country_start_date'] = answers.get('residence_status_start_date', '')
+        answers['current_country_end_date'] = answers.get('residence_status_end_date', '')
+        return 4
+    return 0
+
+
+# Where the rule table deliberately differs from the if-chain
+FIRST_MINOR_STATUS = next(q.position for q in questions if q.field == 'minor_status')
+
+
+@pytest.mark.parametrize("default", ["yes", "no"])
+@pytest.mark.parametrize("value", ["yes", "no", "married", "common-law", "single"])
+def test_rules_jump_like_the_old_if_chain(default, value):
+    for q in questions:
+        answers = {other.field: default for other in questions}
+        answers.update(residence_country="India", residence_status="Citizen")
+        answers[q.field] = value
+        legacy_answers, rule_answers = dict(answers), dict(answers)
+        expected = q.position + 1 + legacy_skip(q.field, legacy_answers)
+        actual = skip_rules.next_index(q.position, rule_answers)
+        if q.position == FIRST_MINOR_STATUS:
+            # The if-chain jumped into the CAQ block from here too
+            assert actual == q.position + 1
+            continue
+        if q.field == 'mailing_address_same':
+            legacy_answers.pop('residential_address')
+            rule_answers.pop('residential_address')
+        assert (actual, rule_answers) == (expected, legacy_answers), q.field
+
+
+def test_mailing_address_is_copied_when_the_same():
+    position = next(q.position for q in questions if q.field == 'mailing_address_same')
+    answers = {'mailing_address': '1 Main St', 'mailing_address_same': 'Yes'}
+    assert skip_rules.next_index(position, answers) == position + 2
+    assert answers['residential_address'] == '1 Main St'
+
+
+@pytest.mark.parametrize("rule, message", [
+    ({"field": "has_caq", "when": {"has_caq": {"equals": "no"}}, "goto": "other_names"}, "skip forward"),
+    ({"field": "minor_status", "when": {"minor_status": {"equals": "no"}}, "goto": "END"}, "occurrence"),
+    ({"field": "other_names", "when": {"has_caq": {"equals": "no"}}, "goto": "END"}, "asked after"),
+    ({"field": "has_caq", "when": {"has_caq": {"is": "no"}}, "goto": "END"}, "must use"),
+    ({"field": "no_such_field", "when": {}, "goto": "END"}, "unknown field"),
+])
+def test_invalid_rules_are_rejected(rule, message):
+    with pytest.raises(SkipRuleError, match=message):
+        compile_skip_rules([rule], questions)
@@ -0,0 +1,35 @@
+import pytest
+
+from spelling import SpellingEngine, should_check
+
+
+@pytest.mark.parametrize("field", [
+    "given_name", "family_name", "passport_number", "uci_number", "uscis_number", "caq_number", "school_dli#",
+    "email", "fax_country_code", "fax_extension", "funds_available", "cost_tuition", "residence_country",
+    "employment_city_2", "post_secondary_province_state", "native_language", "address_in_candada",
+])
+def test_names_places_and_identifiers_are_not_checked(field):
+    assert not should_check(field)
+
+
+@pytest.mark.parametrize("kind", ["date", "phone", "address", "option"])
+def test_validated_kinds_are_not_checked(kind):
+    assert not should_check("employment_job_description", kind)
+
+
+@pytest.mark.parametrize("field", ["employment_job_description", "field_of_study", "occupation", "travel_purpose",
+                                   "criminal_history_details"])
+def test_free_text_is_checked(field):
+    assert should_check(field)
+
+
+def test_domain_words_and_acronyms_are_not_typos():
+    engine = SpellingEngine({"biometrics": 50})
+    assert engine.suggestions("I studdied in Toronto, my UCI is 1234 and I gave biometrics") == [("studdied", "studied")]
+
+
+def test_corrections_are_memoized():
+    engine = SpellingEngine()
+    engine.suggestions("recieve")
+    engine.suggestions("I recieve")
+    assert engine.cache_info().hits == 1
@@ -0,0 +1,20 @@
+from state_codec import StateCodec, is_encoded
+
+
+def make_codec(table_dir):
+    return StateCodec(["prompt", "What is your name?"], ["name", "age"], table_dir=str(table_dir))
+
+
+def test_codec_writes_its_table_on_first_encode(tmp_path):
+    table_dir = tmp_path / "tables"
+    codec = make_codec(table_dir)
+    assert not table_dir.exists()
+
+    state = {"answers": {"name": "Ana", "other": 1},
+             "messages": [{"role": "system", "content": "prompt"}, {"role": "user", "content": "Ana"}],
+             "question_index": 1, "attempt_counter": {"name": 1}}
+    data = codec.encode(state)
+    assert is_encoded(data)
+    assert len(list(table_dir.iterdir())) == 1
+    # A codec built from other questions decodes it with the saved table
+    assert StateCodec(["new prompt"], ["city"], table_dir=str(table_dir)).decode(data) == state
@@ -0,0 +1,91 @@
+import pytest
+
+import state_store
+from state_store import JSONFileStateStore, SQLiteStateStore, VersionConflict
+
+
+class Crash(Exception):
+    pass
+
+
+def test_json_store_skips_journal_left_by_crash_before_unlink(tmp_path, monkeypatch, make_state):
+    store = JSONFileStateStore(str(tmp_path), compact_every=3)
+    version = store.create("c", make_state(0, {}, []))
+    version = store.save("c", make_state(1, {"f1": "v"}, ["m1"]), expected_version=version)
+    version = store.save("c", make_state(2, {"f1": "v"}, ["m1", "m2"]), expected_version=version)
+
+    # The next save compacts; crash after the snapshot replace, before the journal is removed
+    def crash(path):
+        raise Crash(path)
+
+    monkeypatch.setattr(state_store.os, "remove", crash)
+    expected = make_state(3, {"f1": "EDITED"}, ["m1", "m2", "m3"])
+    with pytest.raises(Crash):
+        store.save("c", expected, expected_version=version)
+    monkeypatch.undo()
+    assert (tmp_path / "c.journal").exists()
+
+    state, version = JSONFileStateStore(str(tmp_path)).load("c")
+    assert state == expected
+    assert version == 4
+
+
+def test_json_store_versions_survive_restart(tmp_path, make_state):
+    store = JSONFileStateStore(str(tmp_path), compact_every=10)
+    version = store.create("c", make_state(0, {}, []))
+    for i in range(1, 4):
+        version = store.save("c", make_state(i, {f"f{i}": i}, [f"m{i}"]), expected_version=version)
+
+    reopened = JSONFileStateStore(str(tmp_path), compact_every=10)
+    state, loaded_version = reopened.load("c")
+    assert loaded_version == version == 4
+    assert state == make_state(3, {"f3": 3}, ["m3"])
+    with pytest.raises(VersionConflict):
+        reopened.save("c", state, expected_version=3)
+    assert reopened.save("c", make_state(4, {}, []), expected_version=4) == 5
+    assert JSONFileStateStore(str(tmp_path)).load("c") == (make_state(4, {}, []), 5)
+
+
+def test_json_store_reads_unversioned_files(tmp_path):
+    (tmp_path / "c.json").write_text('{"answers": {}, "messages": [], "question_index": 0}')
+    (tmp_path / "c.journal").write_text('{"set": {"question_index": 1}}\n{"set": {"question_index": 2}}\n')
+    store = JSONFileStateStore(str(tmp_path))
+    state, version = store.load("c")
+    assert state["question_index"] == 2
+    assert version == 2
+    assert store.save("c", {**state, "question_index": 3}, expected_version=2) == 3
+    assert JSONFileStateStore(str(tmp_path)).load("c")[0]["question_index"] == 3
+
+
+def test_sqlite_store_replays_journal(tmp_path, make_state):
+    path = str(tmp_path / "state.sqlite3")
+    store = SQLiteStateStore(path, compact_every=3)
+    version = store.create("c", make_state(0, {}, []))
+    for i in range(1, 6):
+        version = store.save("c", make_state(i, {"f": i}, [f"m{j}" for j in range(i)]), expected_version=version)
+    assert SQLiteStateStore(path).load("c") == (make_state(5, {"f": 5}, ["m0", "m1", "m2", "m3", "m4"]), 6)
+
+
+def test_sqlite_workers_cannot_overwrite_each_other(tmp_path, make_state):
+    path = str(tmp_path / "state.sqlite3")
+    first, second = SQLiteStateStore(path), SQLiteStateStore(path)
+    version = first.create("c", make_state(0))
+    with pytest.raises(VersionConflict):
+        second.create("c", make_state(0))
+
+    assert second.save("c", make_state(1), expected_version=version) == 2
+    with pytest.raises(VersionConflict):
+        first.save("c", make_state(2, {"f": "lost"}), expected_version=version)
+    assert first.load("c") == (make_state(1), 2)
+
+
+def test_sqlite_delete_and_list(tmp_path, make_state):
+    store = SQLiteStateStore(str(tmp_path / "state.sqlite3"))
+    store.create("a", make_state(0))
+    version = store.create("b", make_state(0))
+    store.save("b", make_state(1), expected_version=version)
+    assert store.conversation_ids() == ["a", "b"]
+    assert store.delete("b") is True
+    assert store.delete("b") is False
+    assert store.load("b") is None
+    assert store.conversation_ids() == ["a"]
@@ -0,0 +1,103 @@
+"""
+Compares the local query planner with the LLM query-generation step of call_llm.
+
+Each sample question is answered twice through answer_from_documents, the
+way call_llm does it: once with the queries the LLM writes, once with the
+planner's queries if it is confident enough (the LLM's otherwise). Both
+paths retrieve with every query (dense and BM25 rankings fused), rerank and
+call chat, and their timings cover all of it. Reports the latency of each
+path and the overlap of the documents the answers were given.
+
+Needs Cohere access, or --stub to answer every call in process with the
+canned responses of trainning/cohere_stub_server.py after --latency seconds.
+
+Run from the repository root:
+    python -m trainning.benchmark_query_planner --stub --latency 0.2
+"""
+import argparse
+import time
+import numpy as np
+
+import chatbot_copy
+from chatbot_copy import questions, system_message, answer_from_documents, generate_search_queries
+from cohere_client import get_client
+from embedding_cache import EmbeddingCache
+from query_planner import plan_queries, CONFIDENCE_THRESHOLD
+from trainning import cohere_stub_server
+
+# (user question, field of the form question being answered)
+SAMPLES = [
+    ("What is a DLI?", "school_dli#"),
+    ("What is common-law?", "marital_status"),
+    ("Is common-law the same as married?", "marital_status"),
+    ("Do I need a CAQ to study in Montreal?", "has_caq"),
+    ("What is a provincial attestation letter?", "has_provincial_attestation"),
+    ("Where do I find my UCI number?", "uci_issued"),
+    ("Do I need to fill IMM 5645 if I am single?", "marital_status"),
+    ("What counts as a previous marriage?", "previous_relationship"),
+    ("Does a refused visitor visa count?", "visa_or_entry_refused"),
+    ("How much money do I need to show for tuition and living expenses?", "has_post_secondary_education"),
+    ("What does that mean?", "criminal_history"),
+    ("Can I use an expired passport?", "passport_expiry_date"),
+]
+
+
+def timed(path, *args):
+    """Runs a path with an empty embedding cache, so it embeds every query."""
+    chatbot_copy.query_embedding_cache = EmbeddingCache(path=None)
+    start = time.perf_counter()
+    result = path(*args)
+    return result, time.perf_counter() - start
+
+
+def llm_path(messages, user_question):
+    queries = generate_search_queries(list(messages)) or [user_question]
+    return queries, answer_from_documents(queries)
+
+
+def planner_path(messages, user_question, question_text, field):
+    planned, confidence = plan_queries(user_question, question_text, field)
+    if confidence < CONFIDENCE_THRESHOLD:
+        return planned, confidence, llm_path(messages, user_question)[1]
+    return planned, confidence, answer_from_documents(planned, user_question)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--stub", action="store_true", help="answer Cohere calls with the in-process stub")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the stub waits per call")
+    args = parser.parse_args()
+
+    if args.stub:
+        cohere_stub_server.EMBED_DIMENSION = chatbot_copy.doc_emb.shape[1]
+        chatbot_copy.co = get_client("stub", transport=cohere_stub_server.stub_transport(args.latency))
+
+    question_text = {q.field: q.text for q in questions}
+    llm_times, planner_times, overlaps, bypassed = [], [], [], 0
+
+    for user_question, field in SAMPLES:
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "system", "content": question_text.get(field, "")},
+            {"role": "user", "content": user_question},
+        ]
+
+        (llm_queries, llm_result), seconds = timed(llm_path, messages, user_question)
+        llm_times.append(seconds)
+        (planned, confidence, planner_result), seconds = timed(
+            planner_path, messages, user_question, question_text.get(field, ""), field)
+        planner_times.append(seconds)
+
+        llm_docs, planner_docs = set(llm_result["documents"]), set(planner_result["documents"])
+        overlap = len(llm_docs & planner_docs) / max(1, len(llm_docs))
+        overlaps.append(overlap)
+        bypassed += confidence >= CONFIDENCE_THRESHOLD
+        print(f"{user_question[:50]:<50} confidence {confidence:.2f}  overlap {overlap:.2f}  "
+              f"llm {llm_times[-1] * 1000:.0f} ms  planner {planner_times[-1] * 1000:.0f} ms")
+        print(f"    llm:     {llm_queries}")
+        print(f"    planner: {planned}")
+
+    print(f"\nLLM path:     mean {np.mean(llm_times) * 1000:.0f} ms")
+    print(f"Planner path: mean {np.mean(planner_times) * 1000:.0f} ms")
+    print(f"Mean overlap of the answer documents: {np.mean(overlaps):.2f}")
+    print(f"Planner bypassed the LLM for {bypassed}/{len(SAMPLES)} questions")
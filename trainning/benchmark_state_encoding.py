@@ -0,0 +1,91 @@
+"""
+Compares the compact state encoding with the JSON state files.
+
+Encodes the saved conversations/<id>.json states and synthetic conversations
+that answer the whole form, and reports the encoded size and the encode and
+decode times of JSON, of the codec without compression and, if zstandard is
+installed, of the codec with zstd.
+
+Run from the repository root:
+    python -m trainning.benchmark_state_encoding
+"""
+import argparse
+import glob
+import json
+import time
+
+from chatbot_copy import questions, system_message
+from state_codec import StateCodec, zstandard
+from state_store import SNAPSHOT_VERSION_KEY
+
+
+def synthetic_state(answered, retries_every=5):
+    """A state as chat_step leaves it after `answered` questions, with a retry every few turns."""
+    answers, messages, attempt_counter = {}, [{"role": "system", "content": system_message}], {}
+    for i, q in enumerate(questions[:answered]):
+        answer = q.options[0] if q.options else f"Sample answer {i}"
+        if i % retries_every == 0:
+            messages.append({"role": "system", "content": q.text})
+            messages.append({"role": "user", "content": "What does that mean?"})
+            attempt_counter[q.field] = 1
+        messages.append({"role": "system", "content": q.text})
+        messages.append({"role": "user", "content": answer})
+        messages.append({"role": "assistant", "content": answer})
+        answers[q.field] = answer
+    return {"answers": answers, "messages": messages, "question_index": answered, "skip": 0,
+            "attempt_counter": attempt_counter}
+
+
+def measure(states, encode, decode, repeat):
+    encoded = [encode(state) for state in states]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for state in states:
+            encode(state)
+    encode_time = (time.perf_counter() - start) / (repeat * len(states))
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for data in encoded:
+            decode(data)
+    decode_time = (time.perf_counter() - start) / (repeat * len(states))
+    return sum(len(data) for data in encoded) / len(encoded), encode_time, decode_time
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    texts, fields = [system_message] + [q.text for q in questions], [q.field for q in questions]
+    formats = {
+        "json": (lambda state: json.dumps(state).encode("utf-8"), json.loads),
+        "codec": StateCodec(texts, fields, table_dir=None, compress=False),
+    }
+    if zstandard is not None:
+        formats["codec+zstd"] = StateCodec(texts, fields, table_dir=None, compress=True)
+    else:
+        print("⚠️ zstandard is not installed, skipping codec+zstd")
+
+    saved = []
+    for path in glob.glob("conversations/*.json"):
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        state.pop(SNAPSHOT_VERSION_KEY, None)
+        saved.append(state)
+    workloads = {
+        "saved conversations": saved,
+        "half-way conversation": [synthetic_state(len(questions) // 2)],
+        "completed conversation": [synthetic_state(len(questions))],
+    }
+
+    for name, states in workloads.items():
+        if not states:
+            continue
+        print(f"\n{name} ({len(states)} states)")
+        print(f"{'format':<12}{'bytes':>10}{'ratio':>8}{'encode µs':>12}{'decode µs':>12}")
+        json_size = None
+        for label, codec in formats.items():
+            encode, decode = codec if isinstance(codec, tuple) else (codec.encode, codec.decode)
+            size, encode_time, decode_time = measure(states, encode, decode, args.repeat)
+            json_size = json_size or size
+            print(f"{label:<12}{size:>10.0f}{size / json_size:>8.2f}{encode_time * 1e6:>12.1f}{decode_time * 1e6:>12.1f}")
@@ -0,0 +1,50 @@
+"""
+Builds the BM25 index over the crawled documents.
+
+If an index already exists and the corpus only grew (newly crawled documents
+appended at the end), only the new documents are indexed. Pass --rebuild to
+index everything from scratch.
+
+Run from the repository root:
+    python -m trainning.build_bm25_index
+"""
+import argparse
+import json
+import os
+import time
+
+from bm25_index import BM25Index, BM25_PATH, document_text
+from doc_store import DocStore, StoreError
+
+DOCUMENTS_PATH = "trainning/immigration_data_reduced.json"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rebuild", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        documents = DocStore.open().documents
+    except StoreError:
+        with open(DOCUMENTS_PATH, "r", encoding="utf-8") as f:
+            documents = json.load(f)
+
+    start = time.perf_counter()
+    index = None
+    if os.path.exists(BM25_PATH) and not args.rebuild:
+        index = BM25Index.load(BM25_PATH)
+        if len(index) > len(documents):
+            print(f"Index has {len(index)} documents but the corpus has {len(documents)}, rebuilding.")
+            index = None
+
+    if index is None:
+        index = BM25Index.build(document_text(doc) for doc in documents)
+        print(f"Indexed {len(index)} documents")
+    else:
+        added = len(documents) - len(index)
+        index.add_documents(document_text(documents[i]) for i in range(len(index), len(documents)))
+        print(f"Added {added} new documents, {len(index)} in total")
+
+    index.save(BM25_PATH)
+    print(f"Saved {len(index.vocab)} terms to {BM25_PATH} in {time.perf_counter() - start:.2f}s")
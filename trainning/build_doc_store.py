@@ -0,0 +1,27 @@
+"""
+Converts the embeddings and crawled documents into the versioned document store
+loaded by chatbot_copy.py.
+
+Run from the repository root:
+    python -m trainning.build_doc_store
+"""
+import json
+import numpy as np
+
+from doc_store import build_store, DocStore, STORE_DIR
+
+EMBEDDINGS_PATH = "others/doc_embeddings.npy"
+DOCUMENTS_PATH = "trainning/immigration_data_reduced.json"
+EMBED_MODEL = "embed-v4.0"
+
+
+if __name__ == "__main__":
+    doc_emb = np.load(EMBEDDINGS_PATH)
+    with open(DOCUMENTS_PATH, "r", encoding="utf-8") as f:
+        documents = json.load(f)
+
+    manifest = build_store(doc_emb, documents, EMBED_MODEL, STORE_DIR)
+    print(f"Wrote {manifest['n_docs']} documents to {STORE_DIR} (version {manifest['checksum'][:12]})")
+
+    store = DocStore.open(STORE_DIR)
+    assert store.verify(), "Checksum mismatch after build"
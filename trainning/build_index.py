@@ -0,0 +1,80 @@
+"""
+Builds the retrieval index used by call_llm and compares it against the
+brute-force search call_llm used to do (full dot product + full argsort).
+
+Run from the repository root:
+    python -m trainning.build_index --kind ivf --nlist 64 --nprobe 8
+"""
+import argparse
+import time
+import numpy as np
+
+from doc_store import DocStore, StoreError
+from retrieval_index import FlatIndex, IVFIndex, INDEX_PATH
+
+EMBEDDINGS_PATH = "others/doc_embeddings.npy"
+
+
+def brute_force(query, doc_emb, n):
+    # The original call_llm retrieval
+    scores = np.dot(query, np.transpose(doc_emb))[0]
+    return np.argsort(-scores)[:n]
+
+
+def sample_queries(doc_emb, n_queries, noise, seed=0):
+    """Perturbed documents stand in for real queries, no embed calls needed."""
+    rng = np.random.default_rng(seed)
+    picks = doc_emb[rng.choice(doc_emb.shape[0], n_queries, replace=doc_emb.shape[0] < n_queries)]
+    queries = picks + rng.normal(scale=noise, size=picks.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def compare(index, doc_emb, queries, k):
+    recalls, base_times, index_times = [], [], []
+    for query in queries:
+        query = query[np.newaxis, :]
+
+        start = time.perf_counter()
+        expected = brute_force(query, doc_emb, k)
+        base_times.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        ids, _ = index.search(query, k)
+        index_times.append(time.perf_counter() - start)
+
+        recalls.append(len(set(expected) & set(ids[0])) / k)
+
+    print(f"{index.kind:>5}  recall@{k}: {np.mean(recalls):.3f}  "
+          f"brute force: {np.mean(base_times) * 1000:.3f} ms  "
+          f"index: {np.mean(index_times) * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--kind", choices=["flat", "ivf"], default="ivf")
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--noise", type=float, default=0.02)
+    args = parser.parse_args()
+
+    try:
+        doc_emb = np.asarray(DocStore.open().embeddings)
+    except StoreError:
+        doc_emb = np.load(EMBEDDINGS_PATH).astype(np.float32)
+    print(f"Loaded {doc_emb.shape[0]} embeddings of dimension {doc_emb.shape[1]}")
+
+    start = time.perf_counter()
+    if args.kind == "ivf":
+        index = IVFIndex.build(doc_emb, nlist=args.nlist, nprobe=args.nprobe)
+    else:
+        index = FlatIndex(doc_emb)
+    print(f"Built {args.kind} index in {time.perf_counter() - start:.2f}s")
+
+    queries = sample_queries(doc_emb, args.queries, args.noise)
+    compare(FlatIndex(doc_emb), doc_emb, queries, args.k)
+    compare(index, doc_emb, queries, args.k)
+
+    index.save(INDEX_PATH)
+    print(f"Saved index to {INDEX_PATH}")
@@ -0,0 +1,76 @@
+"""
+Builds the domain lexicon the spell-checker uses on top of its English
+dictionary: country and city names from the gazetteer, the schools of the
+DLI sheet, the answer options of every question and the words of the
+crawled corpus.
+
+Run from the repository root after rebuilding the document store or
+updating the DLI sheet:
+    python -m trainning.build_lexicon
+"""
+import json
+import os
+import time
+import unicodedata
+from collections import Counter
+
+from bm25_index import document_text
+from dli_lookup import load_table
+from doc_store import DocStore, StoreError
+from gazetteer import GAZETTEER_PATH
+from question_table import load_question_table
+from spelling import LEXICON_PATH, WORD
+
+DOCUMENTS_PATH = "trainning/immigration_data_reduced.json"
+QUESTIONS_PATH = "trainning/questions_file_updated.json"
+# Corpus words seen fewer times are more likely typos in the crawl than words
+MIN_CORPUS_COUNT = 3
+# Count given to curated names, enough to be known without outranking common words
+CURATED_COUNT = 5
+
+
+def words(text):
+    # Lexicon words stay ASCII, accented letters would widen every candidate search
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return [w.lower() for w in WORD.findall(text) if len(w) > 1]
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    lexicon = Counter()
+
+    curated = []
+    with open(GAZETTEER_PATH, "r", encoding="utf-8") as f:
+        gazetteer = json.load(f)
+    for place in gazetteer["countries"] + gazetteer["cities"]:
+        for name in (place["name"], *place["aliases"]):
+            curated.extend(words(name))
+    _, schools = load_table()
+    for school, city in schools:
+        curated.extend(words(school) + words(city))
+    for q in load_question_table(QUESTIONS_PATH):
+        for option in q.options:
+            curated.extend(words(option))
+    for word in set(curated):
+        lexicon[word] = CURATED_COUNT
+    print(f"{len(lexicon)} words from the gazetteer, the DLI sheet and the question options")
+
+    try:
+        documents = DocStore.open().documents
+    except StoreError:
+        with open(DOCUMENTS_PATH, "r", encoding="utf-8") as f:
+            documents = json.load(f)
+    corpus = Counter()
+    for doc in documents:
+        corpus.update(words(document_text(doc)))
+    frequent = {word: count for word, count in corpus.items() if count >= MIN_CORPUS_COUNT}
+    for word, count in frequent.items():
+        lexicon[word] = max(lexicon[word], count)
+    print(f"{len(frequent)} words seen at least {MIN_CORPUS_COUNT} times in {len(documents)} documents")
+
+    tmp_path = LEXICON_PATH + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(dict(sorted(lexicon.items())), f)
+    os.replace(tmp_path, LEXICON_PATH)
+    print(f"Saved {len(lexicon)} words to {LEXICON_PATH} in {time.perf_counter() - start:.2f}s")
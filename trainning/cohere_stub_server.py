@@ -0,0 +1,135 @@
+"""
+Local stand-in for the Cohere API, for tests and benchmarks.
+
+Serves /v2/chat, /v2/embed and /v2/rerank (and their /v1 equivalents) with
+canned responses, an optional artificial latency and an optional share of
+429/503 errors, so retries and rate limiting can be exercised offline.
+
+Run from the repository root and point the app at it:
+    python -m trainning.cohere_stub_server --port 8089 --latency 0.2 --error-rate 0.1
+    COHERE_BASE_URL=http://localhost:8089 python app.py
+
+In process, stub_transport() serves the same responses to get_client(transport=...).
+"""
+import argparse
+import hashlib
+import json
+import random
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+EMBED_DIMENSION = 1536
+
+
+def fake_embedding(text, dimension=EMBED_DIMENSION):
+    """Deterministic unit vector per text, so repeated texts embed the same."""
+    seed = int(hashlib.sha1(text.encode("utf-8")).hexdigest()[:8], 16)
+    rng = random.Random(seed)
+    vector = [rng.gauss(0, 1) for _ in range(dimension)]
+    norm = sum(v * v for v in vector) ** 0.5
+    return [v / norm for v in vector]
+
+
+def chat_response(body, v1):
+    text = "VALID: stub answer"
+    if body.get("tools") and not v1:
+        # Query generation: search for the last user message
+        query = next((m["content"] for m in reversed(body.get("messages", [])) if m.get("role") == "user"), "")
+        tool_call = {"id": str(uuid.uuid4()), "type": "function",
+                     "function": {"name": body["tools"][0]["function"]["name"],
+                                  "arguments": json.dumps({"queries": [query]})}}
+        return {"id": str(uuid.uuid4()), "finish_reason": "TOOL_CALL",
+                "message": {"role": "assistant", "tool_calls": [tool_call]}}
+    if v1:
+        return {"response_id": str(uuid.uuid4()), "text": text, "generation_id": str(uuid.uuid4()),
+                "finish_reason": "COMPLETE", "chat_history": []}
+    return {
+        "id": str(uuid.uuid4()),
+        "finish_reason": "COMPLETE",
+        "message": {"role": "assistant", "content": [{"type": "text", "text": text}]},
+    }
+
+
+def embed_response(body, v1):
+    dimension = body.get("output_dimension") or EMBED_DIMENSION
+    embeddings = [fake_embedding(text, dimension) for text in body.get("texts", [])]
+    if v1 and "embedding_types" not in body:
+        return {"id": str(uuid.uuid4()), "response_type": "embeddings_floats",
+                "embeddings": embeddings, "texts": body.get("texts", [])}
+    return {"id": str(uuid.uuid4()), "response_type": "embeddings_by_type",
+            "embeddings": {"float": embeddings}, "texts": body.get("texts", [])}
+
+
+def rerank_response(body, v1):
+    documents = body.get("documents", [])
+    top_n = body.get("top_n") or len(documents)
+    results = [{"index": i, "relevance_score": 1.0 - i / (len(documents) or 1)}
+               for i in range(min(top_n, len(documents)))]
+    return {"id": str(uuid.uuid4()), "results": results}
+
+
+ROUTES = {"chat": chat_response, "embed": embed_response, "rerank": rerank_response}
+
+
+def respond(path, body):
+    """Status and JSON payload for a POST to `path`."""
+    version, _, endpoint = path.strip("/").partition("/")
+    handler = ROUTES.get(endpoint)
+    if handler is None:
+        return 404, {"message": f"Unknown endpoint {path}"}
+    return 200, handler(body, version == "v1")
+
+
+def stub_transport(latency=0.0):
+    """httpx transport answering like the server, without the network."""
+    def handle(request):
+        time.sleep(latency)
+        status, payload = respond(request.url.path, json.loads(request.content or b"{}"))
+        return httpx.Response(status, json=payload)
+
+    return httpx.MockTransport(handle)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+
+        time.sleep(self.latency)
+        status, payload = respond(self.path, body)
+        if status == 200 and random.random() < self.error_rate:
+            return self._send(random.choice([429, 503]), {"message": "stub error"})
+        self._send(status, payload)
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--dimension", type=int, default=EMBED_DIMENSION, help="size of the embeddings")
+    args = parser.parse_args()
+
+    EMBED_DIMENSION = args.dimension
+
+    StubHandler.latency = args.latency
+    StubHandler.error_rate = args.error_rate
+    server = ThreadingHTTPServer(("localhost", args.port), StubHandler)
+    print(f"Cohere stub listening on http://localhost:{args.port}")
+    server.serve_forever()
@@ -2,13 +2,13 @@ import requests
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
 import json
-import cohere
+from cohere_client import get_client
 import pandas as pd
 import PyPDF2
 from io import BytesIO
 
 
-co = cohere.ClientV2(
+co = get_client(
     "yKJqWEwcoD5FXaArm70AjnqV4QRglvDP5yzLPuf8"
 )
 
@@ -0,0 +1,81 @@
+"""
+Local stand-in for the Radar forward-geocode API, for tests and benchmarks.
+
+Serves /v1/geocode/forward. Countries and cities are answered from the
+bundled gazetteer, queries with a house number are echoed back as a street
+address, anything else is not found. An optional artificial latency and an
+optional share of 429/503 errors exercise the client's deadline and retries.
+
+Run from the repository root and point the app at it:
+    python -m trainning.geocode_stub_server --port 8090 --latency 0.3 --error-rate 0.1
+    RADAR_BASE_URL=http://localhost:8090 python app.py
+"""
+import argparse
+import json
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+from gazetteer import load_gazetteer
+
+gazetteer = load_gazetteer()
+
+
+def forward_response(query):
+    country = gazetteer.country(query)
+    if country:
+        return {"addresses": [{"country": country["name"], "countryCode": country["code"],
+                               "formattedAddress": country["name"], "layer": "country"}]}
+    city = gazetteer.city(query)
+    if city:
+        country = gazetteer.country_by_code(city["country"])["name"]
+        return {"addresses": [{"city": city["name"], "country": country, "countryCode": city["country"],
+                               "formattedAddress": f"{city['name']}, {country}", "layer": "locality"}]}
+    if re.match(r"^\s*\d+\s+\w", query):
+        formatted = ", ".join(part.strip().title() for part in query.split(","))
+        return {"addresses": [{"formattedAddress": formatted, "addressLabel": formatted.split(",")[0],
+                               "layer": "address"}]}
+    return {"addresses": []}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    error_rate = 0.0
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query).get("query", [""])[0]
+
+        time.sleep(self.latency)
+        if url.path != "/v1/geocode/forward":
+            return self._send(404, {"message": f"Unknown endpoint {url.path}"})
+        if random.random() < self.error_rate:
+            return self._send(random.choice([429, 503]), {"message": "stub error"})
+        self._send(200, forward_response(query))
+
+    def _send(self, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    StubHandler.latency = args.latency
+    StubHandler.error_rate = args.error_rate
+    server = ThreadingHTTPServer(("localhost", args.port), StubHandler)
+    print(f"Radar stub listening on http://localhost:{args.port}")
+    server.serve_forever()
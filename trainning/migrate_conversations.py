@@ -0,0 +1,42 @@
+"""
+Imports the conversations/<id>.json state files into the SQLite state store.
+
+Conversations already in the store are left alone unless --overwrite is
+given. The JSON files are not deleted, so STATE_BACKEND=json keeps working
+until the migration has been checked.
+
+Run from the repository root:
+    python -m trainning.migrate_conversations
+"""
+import argparse
+import json
+
+from state_store import JSONFileStateStore, SQLiteStateStore, STATE_DIR, STATE_DB_PATH
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--source", default=STATE_DIR)
+    parser.add_argument("--db", default=STATE_DB_PATH)
+    parser.add_argument("--overwrite", action="store_true")
+    args = parser.parse_args()
+
+    source = JSONFileStateStore(args.source)
+    target = SQLiteStateStore(args.db)
+    existing = set(target.conversation_ids())
+
+    imported = skipped = failed = 0
+    for conversation_id in source.conversation_ids():
+        if conversation_id in existing and not args.overwrite:
+            skipped += 1
+            continue
+        try:
+            state, _ = source.load(conversation_id)
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            print(f"❌ {conversation_id}: {e}")
+            failed += 1
+            continue
+        target.save(conversation_id, state)
+        imported += 1
+
+    print(f"Imported {imported} conversations into {args.db}, skipped {skipped} already there, {failed} unreadable.")
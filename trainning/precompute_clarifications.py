@@ -0,0 +1,46 @@
+"""
+Precomputes the default clarification of every form question, the answer
+call_llm gives when it has nothing more specific to search for.
+
+Run from the repository root after (re)building the document store:
+    python -m trainning.precompute_clarifications
+"""
+import time
+
+from chatbot_copy import questions, data, doc_store, answer_from_documents
+from clarifications import default_query, load_clarifications, save_clarifications
+
+
+if __name__ == "__main__":
+    version = doc_store.version if doc_store else None
+    # Resume from a previous run against the same documents
+    entries = load_clarifications(version)
+
+    for q in questions:
+        if q.field in entries and entries[q.field]["question"] == q.text:
+            continue
+
+        query = default_query(q.text)
+        try:
+            result = answer_from_documents([query])
+        except Exception as e:
+            print(f"Failed on {q.field}: {e}")
+            continue
+
+        entries[q.field] = {
+            "question": q.text,
+            "query": query,
+            "answer": result["answer"],
+            "citations": result["citations"],
+            "documents": [
+                {"index": i, "title": data[i].get("title"), "url": data[i].get("url")}
+                for i in result["documents"]
+            ],
+            "created": time.time(),
+        }
+        # Save as we go so an interrupted run keeps its progress
+        save_clarifications(entries, version)
+        print(f"[{len(entries)}/{len(questions)}] {q.field}")
+
+    save_clarifications(entries, version)
+    print(f"Stored clarifications for {len(entries)} of {len(questions)} questions.")
@@ -3,7 +3,7 @@ import json
 import re
 from typing import Dict, List, Optional, Union, TypedDict, Any
 
-import cohere
+from cohere_client import get_client
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -15,8 +15,8 @@ MODEL = "command-r-plus"  # Using Cohere's powerful model
 api_key = os.environ.get("COHERE_API_KEY")
 print(f"API Key found: {'Yes' if api_key else 'No'}")
 
-# Initialize the Cohere client
-client = cohere.Client(api_key=api_key)
+# Initialize the shared Cohere client (legacy v1 chat API)
+client = get_client(api_key, v1=True)
 
 # Type definitions similar to the TypeScript interfaces
 class StudyPermitData(TypedDict, total=False):
@@ -1,9 +1,9 @@
 import json
-import cohere
+from cohere_client import get_client
 import numpy as np
 from typing import List
 
-co = cohere.ClientV2(
+co = get_client(
     "yKJqWEwcoD5FXaArm70AjnqV4QRglvDP5yzLPuf8"
 )
 